@@ -0,0 +1,81 @@
+"""
+Encode and decode time and payload size of CompactSerialize against JSON (JsonSerialize with the default
+json codec), for a few representative messages. Both go through the same functions as the message classes:
+_compact_encode/_compact_decode for CompactSerialize, the codec's iterencode and loads for JSON.
+
+Runs outside IRIS: a stand-in iris module is installed before intersystems_pyprod is imported.
+
+    python benchmarks/compact_serialize.py
+"""
+
+import random
+import sys
+import time
+import types
+from pathlib import Path
+
+sys.modules["iris"] = types.SimpleNamespace(system=types.SimpleNamespace(Status=object))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from intersystems_pyprod._production_connector import (  # noqa: E402
+    _compact_decode,
+    _compact_encode,
+    _compact_header,
+    _get_json_codec,
+)
+
+REPEAT = 5
+
+
+def messages():
+    random.seed(1)
+    yield "10 scalar fields", {f"field_{i}": (i, f"value {i}", i * 0.5, i % 2 == 0)[i % 4] for i in range(10)}
+    yield "150 list fields", {f"field_{i}": [random.randint(0, 1000) for _ in range(50)] for i in range(150)}
+    yield "10k row dicts", {
+        "batch": 1,
+        "rows": [
+            {"order_id": 100000 + i, "customer": f"customer-{random.randint(1, 500)}", "amount": random.random() * 100}
+            for i in range(10000)
+        ],
+    }
+    yield "10k nested rows", {
+        "batch": 2,
+        "rows": [
+            {"order_id": 100000 + i, "lines": [{"sku": f"SKU{random.randint(1, 9999):04d}", "qty": 2}], "note": None}
+            for i in range(10000)
+        ],
+    }
+
+
+def best_of(function, number):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for _ in range(number):
+            result = function()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best, result
+
+
+def main():
+    codec = _get_json_codec("json")
+    print(f"{'message':18} {'format':8} {'bytes':>9} {'encode ms':>10} {'decode ms':>10}")
+    for message_name, data in messages():
+        names = list(data)
+        header = _compact_header(names)
+        values = list(data.values())
+        number = max(1, 200_000 // len(codec.dumps(data)))
+
+        encode_time, text = best_of(lambda: "".join(codec.iterencode(data)), number)
+        decode_time, decoded = best_of(lambda: codec.loads(text), number)
+        assert decoded == data
+        print(f"{message_name:18} {'json':8} {len(text.encode()):>9} {encode_time * 1000:>10.3f} {decode_time * 1000:>10.3f}")
+
+        encode_time, payload = best_of(lambda: _compact_encode(header, values), number)
+        decode_time, decoded = best_of(lambda: _compact_decode(payload, header, names), number)
+        assert decoded == data
+        print(f"{'':18} {'compact':8} {len(payload):>9} {encode_time * 1000:>10.3f} {decode_time * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+CPU time versus bytes stored for the compression option of message classes.
+
+Writes a few representative payloads into a message stream the way PickleSerialize does, through the
+_CompressingWriter and _IRISStreamWriter of a message class declared with each zlib level, and reads them
+back through _open_payload and _DecompressingReader. Reports the size stored in the stream and the time
+spent writing and reading the message, against the same class without compression.
+
+Runs outside IRIS: a stand-in iris module collects the stream writes in memory, and a stand-in message
+object serves them back from chunksFromIRIS, so the numbers are the python side of a message only.
+
+    python benchmarks/compression.py
+"""
+
+import pickle
+import random
+import sys
+import time
+import types
+from pathlib import Path
+
+LEVELS = [None, 1, 3, 6, 9]
+REPEAT = 5
+
+
+class _StandInStream:
+    @classmethod
+    def _New(cls):
+        return cls()
+
+    def __init__(self):
+        self.chunks = []
+
+    def Write(self, chunk):
+        self.chunks.append(chunk)
+
+
+class _StandInMessage:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def chunksFromIRIS(self, iteration, chunk_size):
+        return self._payload[iteration * chunk_size:(iteration + 1) * chunk_size]
+
+
+sys.modules["iris"] = types.SimpleNamespace(
+    system=types.SimpleNamespace(Status=object),
+    _Stream=types.SimpleNamespace(GlobalCharacter=_StandInStream, GlobalBinary=_StandInStream),
+    _SYS=types.SimpleNamespace(Python=types.SimpleNamespace(Bytes=bytes)),
+)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from intersystems_pyprod import PickleSerialize  # noqa: E402
+from intersystems_pyprod._production_connector import _open_payload, _SerializedStreamReader  # noqa: E402
+
+iris_package_name = "benchmarks"
+
+
+def payloads():
+    random.seed(1)
+    orders = [
+        {
+            "order_id": 100000 + i,
+            "customer": f"customer-{random.randint(1, 500)}",
+            "status": random.choice(["NEW", "PAID", "SHIPPED", "CANCELLED"]),
+            "lines": [{"sku": f"SKU{random.randint(1, 9999):04d}", "qty": random.randint(1, 5)} for _ in range(3)],
+            "note": "",
+        }
+        for i in range(5000)
+    ]
+    yield "5000 orders", {"batch": 1, "orders": orders}
+    yield "one order", orders[0]
+    yield "1 MB random bytes", random.randbytes(1024 * 1024)
+
+
+def message_class(level):
+    keywords = {} if level is None else {"compression": "zlib", "compression_level": level, "compress_above": 0}
+    return type(f"Message{level}", (PickleSerialize,), {"__module__": __name__}, **keywords)
+
+
+def write(cls, data):
+    writer = cls._payload_writer(binary=True)
+    pickle.Pickler(writer, protocol=pickle.HIGHEST_PROTOCOL, fix_imports=False).dump(data)
+    iris_message_object = types.SimpleNamespace()
+    writer.close(iris_message_object)
+    return b"".join(iris_message_object.SerializedStream.chunks)
+
+
+def read(stored):
+    return pickle.load(_open_payload(_SerializedStreamReader(_StandInMessage(stored))))
+
+
+def best_of(function):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    classes = {level: message_class(level) for level in LEVELS}
+    print(f"{'payload':20} {'level':>5} {'bytes':>10} {'ratio':>6} {'write ms':>9} {'read ms':>8}")
+    for name, data in payloads():
+        plain_size = None
+        for level, cls in classes.items():
+            write_time, stored = best_of(lambda: write(cls, data))
+            read_time, decoded = best_of(lambda: read(stored))
+            assert decoded == data
+            plain_size = plain_size or len(stored)
+            print(
+                f"{name if level is None else '':20} {'-' if level is None else level:>5} {len(stored):>10}"
+                f" {plain_size / len(stored):>6.2f} {write_time * 1000:>9.2f} {read_time * 1000:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
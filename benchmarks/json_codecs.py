@@ -0,0 +1,65 @@
+"""
+Encode and decode throughput of the JSON codecs available to JsonSerialize, for a few representative
+messages. Encoding goes through the codec's iterencode, as update_iris_message_object does, and decoding
+through its loads. Codecs whose library is not installed are skipped.
+
+Runs outside IRIS: a stand-in iris module is installed before intersystems_pyprod is imported.
+
+    python benchmarks/json_codecs.py
+"""
+
+import importlib.util
+import random
+import sys
+import time
+import types
+from pathlib import Path
+
+sys.modules["iris"] = types.SimpleNamespace(system=types.SimpleNamespace(Status=object))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from intersystems_pyprod._production_connector import _get_json_codec  # noqa: E402
+
+CODECS = {"json": None, "orjson": "orjson", "msgspec": "msgspec"}
+REPEAT = 5
+
+
+def messages():
+    random.seed(1)
+    yield "10 scalar fields", {f"field_{i}": (i, f"value {i}", i * 0.5, i % 2 == 0)[i % 4] for i in range(10)}
+    yield "150 list fields", {f"field_{i}": [random.randint(0, 1000) for _ in range(50)] for i in range(150)}
+    yield "10k row dicts", {
+        "batch": 1,
+        "rows": [
+            {"order_id": 100000 + i, "customer": f"customer-{random.randint(1, 500)}", "amount": random.random() * 100}
+            for i in range(10000)
+        ],
+    }
+
+
+def best_of(function, number):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for _ in range(number):
+            result = function()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best, result
+
+
+def main():
+    codecs = [name for name, module in CODECS.items() if module is None or importlib.util.find_spec(module)]
+    print(f"{'message':18} {'codec':8} {'bytes':>9} {'encode MB/s':>12} {'decode MB/s':>12}")
+    for message_name, data in messages():
+        for name in codecs:
+            codec = _get_json_codec(name)
+            number = max(1, 200_000 // len(codec.dumps(data)))
+            encode_time, text = best_of(lambda: "".join(codec.iterencode(data)), number)
+            decode_time, decoded = best_of(lambda: codec.loads(text), number)
+            assert decoded == data
+            size = len(text.encode("utf-8")) / 1024 / 1024
+            print(f"{message_name:18} {name:8} {len(text):>9} {size / encode_time:>12.1f} {size / decode_time:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Peak memory and throughput of writing JsonSerialize payloads into IRIS: the streaming encoder used by
+update_iris_message_object against encoding the whole document with json.dumps and writing it in slices,
+as earlier versions did.
+
+Runs outside IRIS: a stand-in iris module accepts the stream writes and drops them, so the numbers are the
+python side of serializing a message only. Every measurement runs in a new process, and the peak is the
+growth of its resident set size while serializing, on top of the message fields themselves.
+
+    python benchmarks/json_streaming.py
+    python benchmarks/json_streaming.py --sizes 1K 1M 10M
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import types
+from pathlib import Path
+
+SIZES = ["1K", "1M", "10M", "100M", "500M"]
+SHAPES = ["rows", "text"]
+MODES = ["dumps", "streaming"]
+UNITS = {"K": 1024, "M": 1024 * 1024}
+
+
+class _StandInStream:
+    @classmethod
+    def _New(cls):
+        return cls()
+
+    def Write(self, chunk):
+        pass
+
+
+class _StandInMessageClass:
+    @staticmethod
+    def _New():
+        return types.SimpleNamespace()
+
+
+def install_stand_in_iris():
+    sys.modules["iris"] = types.SimpleNamespace(
+        system=types.SimpleNamespace(Status=object),
+        _Stream=types.SimpleNamespace(GlobalCharacter=_StandInStream, GlobalBinary=_StandInStream),
+        benchmarks=types.SimpleNamespace(Rows=_StandInMessageClass, Text=_StandInMessageClass),
+    )
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+
+def parse_size(text):
+    return int(text[:-1]) * UNITS[text[-1]] if text[-1] in UNITS else int(text)
+
+
+def build(shape, size):
+    if shape == "text":
+        return {"label": "text", "body": "x" * size}
+    row = {"order_id": 100000, "customer": "customer-123", "status": "SHIPPED", "lines": [{"sku": "SKU0042", "qty": 3}]}
+    count = max(1, size // len(json.dumps(row)))
+    return {"label": "rows", "rows": [dict(row, order_id=100000 + i) for i in range(count)]}
+
+
+def resident_kb():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def reset_peak():
+    """Reset the peak resident set size of this process where the kernel allows it."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(shape, size, mode):
+    install_stand_in_iris()
+    from intersystems_pyprod import JsonSerialize
+    from intersystems_pyprod._production_connector import BELOW_MAX_STRING, _IRISStreamWriter
+
+    module = types.ModuleType("benchmarks")
+    module.iris_package_name = "benchmarks"
+    sys.modules["benchmarks"] = module
+    namespace = {"__module__": "benchmarks"}
+    if shape == "text":
+        Message = type("Text", (JsonSerialize,), {**namespace, "label": "", "body": ""})
+    else:
+        Message = type("Rows", (JsonSerialize,), {**namespace, "label": "", "rows": []})
+    message = Message(**build(shape, size))
+
+    def dumps():
+        writer = _IRISStreamWriter()
+        text = json.dumps({name: getattr(message, name) for name in Message._field_names})
+        for start in range(0, len(text), BELOW_MAX_STRING):
+            writer.write(text[start:start + BELOW_MAX_STRING])
+        writer.close(types.SimpleNamespace())
+
+    run = dumps if mode == "dumps" else message.update_iris_message_object
+    baseline = resident_kb()
+    exact = reset_peak()
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    growth = peak_kb() - (baseline if exact else peak_kb())
+    return seconds, max(growth, 0) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", nargs="+", default=SIZES)
+    parser.add_argument("--shapes", nargs="+", default=SHAPES, choices=SHAPES)
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        shape, size, mode = args.child
+        print(json.dumps(measure(shape, int(size), mode)))
+        return
+
+    print(f"{'shape':6} {'size':>6} {'dumps s':>9} {'MB/s':>7} {'peak MB':>8} {'stream s':>9} {'MB/s':>7} {'peak MB':>8}")
+    for shape in args.shapes:
+        for size_text in args.sizes:
+            size = parse_size(size_text)
+            row = [f"{shape:6} {size_text:>6}"]
+            for mode in MODES:
+                output = subprocess.run(
+                    [sys.executable, __file__, "--child", shape, str(size), mode],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                seconds, peak = json.loads(output)
+                row.append(f"{seconds:>9.3f} {size / 1024 / 1024 / seconds:>7.1f} {peak:>8.1f}")
+            print(" ".join(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Import time of a module defining many message classes, most of which is spent in
+ProductionMessage.__init_subclass__ working out the fields of each class.
+
+Runs outside IRIS: a stand-in iris module is installed before intersystems_pyprod is imported. The module
+with the message classes is written to a temporary directory and imported in a fresh interpreter for
+each run, so that nothing is cached between runs.
+
+    python benchmarks/message_class_import.py [number of classes]
+"""
+
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+MESSAGE_CLASS = '''
+class Message{index}(JsonSerialize):
+    order_id: int = Column(index=True)
+    customer: str = Column()
+    status = Column(default="NEW")
+    lines = []
+    note: str = ""
+
+    def total(self):
+        return sum(line["qty"] for line in self.lines)
+'''
+
+IMPORT_AND_TIME = '''
+import sys, time, types
+sys.modules["iris"] = types.SimpleNamespace(system=types.SimpleNamespace(Status=object))
+sys.path[:0] = [{src!r}, {directory!r}]
+import intersystems_pyprod
+start = time.perf_counter()
+import many_messages
+print(time.perf_counter() - start)
+'''
+
+
+def main(classes=500, repeat=5):
+    with tempfile.TemporaryDirectory() as directory:
+        source = "from intersystems_pyprod import Column, JsonSerialize\n"
+        source += "".join(MESSAGE_CLASS.format(index=index) for index in range(classes))
+        (Path(directory) / "many_messages.py").write_text(source)
+        script = IMPORT_AND_TIME.format(src=str(SRC), directory=directory)
+        times = []
+        for _ in range(repeat):
+            result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+            times.append(float(result.stdout))
+    print(f"{classes} message classes: import {min(times) * 1000:.1f} ms ({min(times) / classes * 1e6:.0f} us per class)")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
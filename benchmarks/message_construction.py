@@ -0,0 +1,81 @@
+"""
+Construction time of new messages: the __init__ generated for each message class against the generic
+ProductionMessage.__init__ path.
+
+Runs outside IRIS: a stand-in iris module is installed before intersystems_pyprod is imported, and its
+_New() returns a plain object, so the numbers are the python side of constructing a message only.
+
+    python benchmarks/message_construction.py
+"""
+
+import sys
+import timeit
+import types
+from pathlib import Path
+
+
+class _StandInIRISClass:
+    @staticmethod
+    def _New():
+        return object()
+
+
+sys.modules["iris"] = types.SimpleNamespace(
+    system=types.SimpleNamespace(Status=object),
+    benchmarks=types.SimpleNamespace(
+        Small=_StandInIRISClass, Wide=_StandInIRISClass, Columns=_StandInIRISClass
+    ),
+)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from intersystems_pyprod import Column, JsonSerialize  # noqa: E402
+
+iris_package_name = "benchmarks"
+
+
+class Small(JsonSerialize):
+    name = ""
+    amount = 0
+
+
+class Columns(JsonSerialize):
+    order_id = Column(datatype=int, index=True)
+    customer = Column(datatype=str)
+    status = Column(default="NEW")
+    lines = []
+
+
+class Wide(JsonSerialize):
+    f00 = 0; f01 = 0; f02 = 0; f03 = 0; f04 = 0; f05 = 0; f06 = 0; f07 = 0; f08 = 0; f09 = 0  # noqa: E702
+    f10 = 0; f11 = 0; f12 = 0; f13 = 0; f14 = 0; f15 = 0; f16 = 0; f17 = 0; f18 = 0; f19 = 0  # noqa: E702
+
+
+def generic(cls, *args, **kwargs):
+    message = cls.__new__(cls)
+    JsonSerialize.__init__(message, *args, **kwargs)
+    return message
+
+
+CASES = [
+    ("Small, positional", Small, ("a", 1), {}),
+    ("Small, defaults", Small, (), {}),
+    ("Columns, keywords", Columns, (), {"order_id": 1, "customer": "c", "lines": []}),
+    ("Wide, 20 positional", Wide, tuple(range(20)), {}),
+    ("Wide, 2 keywords", Wide, (), {"f03": 1, "f17": 2}),
+]
+
+
+def main(number=200_000):
+    print(f"{'case':24} {'generic us':>11} {'compiled us':>12} {'speedup':>8}")
+    for name, cls, args, kwargs in CASES:
+        assert vars(generic(cls, *args, **kwargs)) == vars(cls(*args, **kwargs))
+        generic_time = min(timeit.repeat(lambda: generic(cls, *args, **kwargs), number=number, repeat=5))
+        compiled_time = min(timeit.repeat(lambda: cls(*args, **kwargs), number=number, repeat=5))
+        print(
+            f"{name:24} {generic_time / number * 1e6:>11.3f} {compiled_time / number * 1e6:>12.3f}"
+            f" {generic_time / compiled_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
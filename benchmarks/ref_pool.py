@@ -0,0 +1,114 @@
+"""
+iris.ref allocations and time per call of SendRequestSync and BusinessHost_ProcessInput: the pooled references
+of the host classes against allocating fresh ones on every call, as earlier versions did.
+
+Runs outside IRIS: a stand-in iris module counts the iris.ref objects created, and stand-in host objects fill
+the output references the way IRIS does, so the numbers are the python side of a call only.
+
+    python benchmarks/ref_pool.py
+"""
+
+import sys
+import timeit
+import types
+from pathlib import Path
+
+
+class _StandInRef:
+    created = 0
+
+    def __init__(self):
+        _StandInRef.created += 1
+        self.value = None
+
+
+sys.modules["iris"] = types.SimpleNamespace(system=types.SimpleNamespace(Status=object), ref=_StandInRef)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import iris  # noqa: E402
+from intersystems_pyprod import BusinessService, InboundAdapter  # noqa: E402
+
+iris_package_name = "benchmarks"
+
+
+class _StandInHost:
+    def SendRequestSync(self, target, request, response, timeout, description, send_sync_handling):
+        response.value = request
+        return 1
+
+
+class _StandInBusinessHost:
+    def ProcessInput(self, input, output, hint):
+        output.value = input
+        return 1
+
+
+class Service(BusinessService):
+    pass
+
+
+class Adapter(InboundAdapter):
+    pass
+
+
+def fresh_send_request_sync(host, target, request, timeout=-1, description=""):
+    response = iris.ref()
+    send_sync_handling = iris.ref()
+    status = host.iris_host_object.SendRequestSync(
+        target, host.request_to_send(request), response, timeout, description, send_sync_handling
+    )
+    response_value = response.value
+    response.value = None
+    send_sync_handling.value = None
+    del response
+    del send_sync_handling
+    return status, response_value
+
+
+def fresh_process_input(host, input, in_hint=""):
+    output = iris.ref()
+    output.value = ""
+    hint = iris.ref()
+    hint.value = in_hint
+    status = host.iris_host_object.BusinessHost.ProcessInput(input, output, hint)
+    output_value = output.value
+    output.value = None
+    del output
+    hint.value = None
+    del hint
+    return status, output_value
+
+
+def measure(function, number):
+    _StandInRef.created = 0
+    function()
+    _StandInRef.created = 0
+    seconds = min(timeit.repeat(function, number=number, repeat=5))
+    return seconds / number * 1e6, _StandInRef.created / (5 * number)
+
+
+def main(number=200_000):
+    service = Service(_StandInHost())
+    adapter = Adapter(types.SimpleNamespace(BusinessHost=_StandInBusinessHost()))
+    cases = [
+        (
+            "SendRequestSync",
+            lambda: fresh_send_request_sync(service, "target", "request"),
+            lambda: service.SendRequestSync("target", "request"),
+        ),
+        (
+            "BusinessHost_ProcessInput",
+            lambda: fresh_process_input(adapter, "input"),
+            lambda: adapter.BusinessHost_ProcessInput("input"),
+        ),
+    ]
+    print(f"{'call':26} {'fresh us':>9} {'refs/call':>10} {'pooled us':>10} {'refs/call':>10}")
+    for name, fresh, pooled in cases:
+        assert fresh() == pooled()
+        fresh_time, fresh_refs = measure(fresh, number)
+        pooled_time, pooled_refs = measure(pooled, number)
+        print(f"{name:26} {fresh_time:>9.3f} {fresh_refs:>10.2f} {pooled_time:>10.3f} {pooled_refs:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Peak memory and time of rebuilding incoming messages from their SerializedStream: reading through
+_SerializedStreamReader against joining every chunk into one object first, as earlier versions did.
+
+Runs outside IRIS: a stand-in message object serves chunksFromIRIS from a payload held in memory, so the
+numbers are the python side of reading a message only. Every measurement runs in a new process, and the peak
+is the growth of its resident set size while reading, on top of the stored payload.
+
+PickleSerialize payloads are unpickled straight from the reader. JSON payloads are read whole in both cases,
+as the json module cannot decode a document in pieces; they are listed to show that.
+
+    python benchmarks/stream_reading.py
+    python benchmarks/stream_reading.py --sizes 1M 100M
+"""
+
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import time
+import types
+from pathlib import Path
+
+SIZES = ["1K", "1M", "10M", "100M", "500M"]
+MODES = ["joined", "reader"]
+UNITS = {"K": 1024, "M": 1024 * 1024}
+
+
+class _StandInMessage:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def chunksFromIRIS(self, iteration, chunk_size):
+        return self._payload[iteration * chunk_size:(iteration + 1) * chunk_size]
+
+
+def parse_size(text):
+    return int(text[:-1]) * UNITS[text[-1]] if text[-1] in UNITS else int(text)
+
+
+def resident_kb():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def peak_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+
+
+def measure(kind, size, mode):
+    sys.modules["iris"] = types.SimpleNamespace(system=types.SimpleNamespace(Status=object))
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+    from intersystems_pyprod._production_connector import BELOW_MAX_STRING, _open_payload, _SerializedStreamReader
+
+    if kind == "pickle":
+        payload = pickle.dumps({"name": "blob", "data": os.urandom(size)}, protocol=pickle.HIGHEST_PROTOCOL)
+        loads, load = pickle.loads, pickle.load
+    else:
+        payload = json.dumps({"name": "text", "body": "x" * size})
+        loads, load = json.loads, (lambda reader: json.loads(reader.read()))
+    message = _StandInMessage(payload)
+
+    def joined():
+        pieces, iteration = [], 0
+        while True:
+            part = message.chunksFromIRIS(iteration, BELOW_MAX_STRING)
+            if not part:
+                break
+            pieces.append(part)
+            iteration += 1
+        return loads(payload[:0].join(pieces))
+
+    def reader():
+        return load(_open_payload(_SerializedStreamReader(message)))
+
+    run = joined if mode == "joined" else reader
+    baseline = resident_kb()
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+    start = time.perf_counter()
+    result = run()
+    seconds = time.perf_counter() - start
+    assert len(result["data" if kind == "pickle" else "body"]) == size
+    return seconds, max(peak_kb() - baseline, 0) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", nargs="+", default=SIZES)
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        kind, size, mode = args.child
+        print(json.dumps(measure(kind, int(size), mode)))
+        return
+
+    print(f"{'payload':7} {'size':>6} {'joined s':>9} {'peak MB':>8} {'reader s':>9} {'peak MB':>8}")
+    for kind in ("pickle", "json"):
+        for size_text in args.sizes:
+            row = [f"{kind:7} {size_text:>6}"]
+            for mode in MODES:
+                output = subprocess.run(
+                    [sys.executable, __file__, "--child", kind, str(parse_size(size_text)), mode],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                seconds, peak = json.loads(output)
+                row.append(f"{seconds:>9.3f} {peak:>8.1f}")
+            print(" ".join(row))
+
+
+if __name__ == "__main__":
+    main()
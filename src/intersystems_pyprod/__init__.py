@@ -5,14 +5,17 @@ import importlib
 
 __all__ = ["IRISParameter", "IRISProperty", "InboundAdapter", "BusinessService",
           "BusinessProcess","BusinessOperation","OutboundAdapter","ProductionMessage",
-          "Column","JsonSerialize","PickleSerialize","IRISLog","Status","debug_host","_add_to_sys_path"]
+          "Column","JsonSerialize","PickleSerialize","CompactSerialize","RecordBatch","IRISLog","Status","debug_host",
+          "register_json_codec","set_json_codec","set_claim_check_directory","_add_to_sys_path",
+          "_business_process_object","_release_claim_check"]
 
 if TYPE_CHECKING:
     # --- static hints, allows cli tool to run without breaking because of imports ---
     from ._production_connector import ( IRISParameter,IRISProperty,
     InboundAdapter,BusinessService,BusinessProcess,BusinessOperation,
     OutboundAdapter,ProductionMessage,Column,JsonSerialize,
-    PickleSerialize,IRISLog,Status,debug_host,)
+    PickleSerialize,CompactSerialize,RecordBatch,IRISLog,Status,debug_host,
+    register_json_codec,set_json_codec,set_claim_check_directory,)
 
 def __getattr__(name: str):
     if name in __all__:
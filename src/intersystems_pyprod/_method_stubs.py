@@ -1,3 +1,254 @@
+# SetColumns and GetColumns methods of every message class, used by python to write and read all the columns of
+# a message in one call
+_COLUMN_METHODS = """/// Sets the properties named in the comma separated list names to the values that follow, so that python
+/// stores every column of a message in one call
+Method SetColumns(names As %String, values...)
+{{
+    for i=1:1:$get(values) {{
+        set $property($this, $piece(names, ",", i)) = values(i)
+    }}
+}}
+
+/// Returns the properties named in the comma separated list names as a JSON array, so that python reads
+/// every column of a message in one call
+Method GetColumns(names As %String) As %String
+{{
+    set columns = []
+    for i=1:1:$length(names, ",") {{
+        do columns.%Push($property($this, $piece(names, ",", i)))
+    }}
+    return columns.%ToJSON()
+}}
+
+"""
+
+# Message class stored in a binary stream, used by PickleSerialize, CompactSerialize and RecordBatch
+_BINARY_STREAM_MESSAGE = """
+/// DO NOT EDIT. Generated by {ClassName} python class
+Class {PackageName}.{ClassName} Extends (%Persistent, Ens.Request)
+{{
+
+Property SerializedStream As %Stream.GlobalBinary;
+
+{props}
+
+{indices}
+
+""" + _COLUMN_METHODS + """/// Used by Business Process and BusinessOperation callbacks to send in a python object
+/// in case the incoming request/response if of a user defined persistable type..
+Method chunksFromIRIS(iteration As %Integer, chunkSize As %Integer = 1048576) As %SYS.Python
+{{
+    if iteration = 0 {{
+        do ..SerializedStream.Rewind()
+    }}
+    if ..SerializedStream.AtEnd {{
+        return ##class(%SYS.Python).Bytes("")
+    }}
+    Set chunkfromstream = ..SerializedStream.Read(chunkSize)
+    return ##class(%SYS.Python).Bytes(chunkfromstream)
+    
+}}
+
+
+}}
+"""
+
+# methods of the message classes declared with inline_max, which read the payload from SerializedData when it
+# was small enough to be kept there, and from SerializedStream otherwise. Added after _COLUMN_METHODS
+_INLINE_JSON_METHODS = """/// Used by Business Process and BusinessOperation callbacks to send in a python object
+/// in case the incoming request/response if of a user defined persistable type..
+Method chunksFromIRIS(iteration As %Integer, chunkSize As %Integer = 1048576) As %String
+{{
+    if ..SerializedData '= "" {{
+        return $select(iteration = 0: ..SerializedData, 1: "")
+    }}
+    if iteration = 0 {{
+        do ..SerializedStream.Rewind()
+    }}
+    if ..SerializedStream.AtEnd {{
+        return ""
+    }}
+    return ..SerializedStream.Read(chunkSize)
+}}
+
+Method %GetContentType() As %String
+{{
+    if (..SerializedData '= "") || (..SerializedStream.Size > 0) {{
+        Quit "application/json"
+    }}
+    Quit ##super()
+}}
+
+Method OnShowJSONContents(pZenOutput As %Boolean = 0)
+{{
+    if ..SerializedData '= "" {{
+        set tStream = ##class(%Stream.TmpCharacter).%New()
+        do tStream.Write(..SerializedData)
+        Do ..OutputFormattedJSON(tStream)
+        Quit
+    }}
+    Do ..OutputFormattedJSON(..SerializedStream)
+}}
+"""
+
+_INLINE_BINARY_METHODS = """/// Used by Business Process and BusinessOperation callbacks to send in a python object
+/// in case the incoming request/response if of a user defined persistable type..
+Method chunksFromIRIS(iteration As %Integer, chunkSize As %Integer = 1048576) As %SYS.Python
+{{
+    if ..SerializedData '= "" {{
+        return ##class(%SYS.Python).Bytes($select(iteration = 0: ..SerializedData, 1: ""))
+    }}
+    if iteration = 0 {{
+        do ..SerializedStream.Rewind()
+    }}
+    if ..SerializedStream.AtEnd {{
+        return ##class(%SYS.Python).Bytes("")
+    }}
+    Set chunkfromstream = ..SerializedStream.Read(chunkSize)
+    return ##class(%SYS.Python).Bytes(chunkfromstream)
+}}
+"""
+
+
+# Sets status and {output} from the result of a python helper called as {call}. The helpers are passed packed=1
+# and return the status alone, the response alone when the status is OK, or a (status, response) tuple. Classes
+# generated by earlier versions call them without it and read "status", "<key>_available" and "<key>" from the
+# dict they return, in up to three calls into python; legacy=True generates that variant (see LEGACY_STUBS).
+def _helper_result(call, output, legacy=False, key="response"):
+    if legacy:
+        return f"""set arr = {call})
+        set status = arr."__getitem__"("status")
+        if arr."__getitem__"("{key}_available") {{{{
+            set {output} = arr."__getitem__"("{key}")
+        }}}}"""
+    return f"""set result = {call},1)
+        if '$isobject(result) {{{{
+            set status = result
+        }}}} elseif $classname(result) '= "%SYS.Python" {{{{
+            set status = $$$OK, {output} = result
+        }}}} else {{{{
+            set status = result."__getitem__"(0), {output} = result."__getitem__"(1)
+        }}}}"""
+
+
+# Host methods that call a python helper, per host
+def _helper_methods(legacy=False):
+    return {
+
+# ______________________________________________________________________________________________ BusinessService # 
+"BusinessService": {
+
+    "OnProcessInput": 
+            f"""
+
+Method OnProcessInput(pInput As %RegisteredObject, Output pOutput As %RegisteredObject) As %Status
+{{{{
+    try{{{{
+        {_helper_result("..PythonClassObject.OnProcessInputHelper(pInput", "pOutput", legacy, key="pOutput")}
+    }}}} catch e{{{{
+        set status = $system.Status.Error(5001, e.AsSystemError())
+        $$$LOGERROR(status)
+    }}}}
+
+    Quit status
+}}}}
+
+            """
+    },
+
+# ______________________________________________________________________________________________ BusinessProcess # 
+"BusinessProcess": {
+    # OnRequest
+    "OnRequest": 
+            f"""
+Method OnRequest(request As %Library.Persistent, Output response As %Library.Persistent) As %Status
+{{{{
+    try{{{{
+        set PythonClassObject = ..GetPythonClassObject()
+        {_helper_result("PythonClassObject.OnRequestHelper(request", "response", legacy)}
+    }}}} catch e {{{{
+        set status = $system.Status.Error(5001, e.AsSystemError())
+        $$$LOGERROR("ERROR IN BP"_status)
+    }}}}
+    Quit status
+}}}}
+            """,
+
+    # OnResponse
+    "OnResponse": f"""
+
+Method OnResponse(request As %Library.Persistent, ByRef response As %Library.Persistent, callrequest As %Library.Persistent, callresponse As %Library.Persistent, pCompletionKey As %String) As %Status
+{{{{
+    try{{{{
+        set PythonClassObject = ..GetPythonClassObject()
+        {_helper_result("PythonClassObject.OnResponseHelper(request,response,callrequest,callresponse,pCompletionKey", "response", legacy)}
+    }}}} catch e {{{{
+        set status = $system.Status.Error(5001, e.AsSystemError())
+        $$$LOGERROR(status)
+    }}}}
+    Quit status
+}}}}
+
+"""
+    },
+
+# ______________________________________________________________________________________________ BusinessOperation #  
+"BusinessOperation": {
+    # Any method for a business operation will have the same custom stub as follows.
+        "AnyMethod": f"""
+Method {{MethodNameModified}}(pRequest As %Library.Persistent, Output pResponse As %Library.Persistent) As %Status
+{{{{
+    try{{{{
+        {_helper_result('..PythonClassObject.AnyMethodHelper(pRequest,"{MethodName}"', "pResponse", legacy)}
+    }}}} catch e {{{{
+        set status = $system.Status.Error(5001, e.AsSystemError())
+        $$$LOGERROR(status)
+    }}}}
+    Quit status
+}}}}
+
+
+"""
+,
+"OnMessage": f"""
+Method OnMessage(pRequest As %Library.Persistent, Output pResponse As %Library.Persistent) As %Status
+{{{{
+    try{{{{
+        {_helper_result("..PythonClassObject.OnMessageHelper(pRequest,pResponse", "pResponse", legacy)}
+    }}}} catch e {{{{
+        set status = $system.Status.Error(5001, e.AsSystemError())
+        $$$LOGERROR(status)
+    }}}}
+    Quit status
+}}}}
+
+
+"""
+    },
+
+# ______________________________________________________________________________________________ OutboundAdapter #  
+    "OutboundAdapter":{
+        # Any method for an outbound adapter will have the same custom stub as follows.
+        "AnyMethod":f"""
+
+Method {{MethodNameModified}}(arguments As %Library.RegisteredObject, Output pResponse As %Library.RegisteredObject) As %Status
+{{{{
+    try{{{{
+        {_helper_result('..PythonClassObject.AnyMethodHelper(arguments,"{MethodName}"', "pResponse", legacy)}
+    }}}} catch e {{{{
+        set status = $system.Status.Error(5001, e.AsSystemError())
+        $$$LOGERROR(status)
+    }}}}
+    Quit status
+}}}}
+
+"""
+    },
+}
+
+
+_HELPER_METHODS = _helper_methods()
+
 STUBS = {
 
 # ______________________________________________________________________________________________ Class #
@@ -60,6 +311,12 @@ Property PythonClassName As %String(MAXLEN = "") [ InitialExpression = "{ClassNa
 
 Property PythonModuleOrScript As %String(MAXLEN = "") [ InitialExpression = "{ScriptName}" ];
 
+/// Responses collected so far by the outstanding scatter of the python class, if any
+Property PythonGatherState As %String(MAXLEN = "");
+
+/// Responses of the steps completed so far by a generator OnRequest of the python class, if it is waiting
+Property PythonStepState As %String(MAXLEN = "");
+
 Method OnInit() As %Status
 {{
     s status = $$$OK
@@ -73,6 +330,66 @@ Method OnInit() As %Status
     Quit status
 }}
 
+/// Returns the python object that handles callbacks for this instance. Unless the python class
+/// sets cache_python_instance, a new python object is built on every call.
+Method GetPythonClassObject() As %SYS.Python
+{{
+    set pyprod = ##class(%SYS.Python).Import("intersystems_pyprod")
+    Quit $method(pyprod,"_business_process_object",..PythonModuleOrScript,..PythonClassName,$this)
+}}
+
+""",
+
+######## SendMany
+    "SendMany":
+    """
+
+/// Called by send_many to send count requests with SendRequestAsync in one call from python. targets and
+/// requests are either one value for every request or a python list with one item per request. Returns ""
+/// when every request was sent, or a python dict from the position of each failed request to its status.
+Method SendMany(count As %Integer, targets, requests, description As %String = "") As %SYS.Python
+{{
+    set errors = ""
+    set targetList = $isobject(targets), requestList = ($classname(requests) = "%SYS.Python")
+    for i = 0:1:count-1 {{
+        set target = $select(targetList: targets."__getitem__"(i), 1: targets)
+        set request = $select(requestList: requests."__getitem__"(i), 1: requests)
+        set status = ..SendRequestAsync(target, request, description)
+        if $$$ISERR(status) {{
+            if '$isobject(errors) {{ set errors = ##class(%SYS.Python).Builtins().dict() }}
+            do errors."__setitem__"(i, status)
+        }}
+    }}
+    Quit errors
+}}
+
+""",
+
+######## SendManyBP
+    "SendManyBP":
+    """
+
+/// Called by send_many to send count requests with SendRequestAsync in one call from python. targets, requests
+/// and completionKeys are either one value for every request or a python list with one item per request.
+/// Returns "" when every request was sent, or a python dict from the position of each failed request to its status.
+Method SendMany(count As %Integer, targets, requests, responseRequired As %Boolean = 1, completionKeys = "", description As %String = "") As %SYS.Python
+{{
+    set errors = ""
+    set targetList = $isobject(targets), requestList = ($classname(requests) = "%SYS.Python")
+    set keyList = $isobject(completionKeys)
+    for i = 0:1:count-1 {{
+        set target = $select(targetList: targets."__getitem__"(i), 1: targets)
+        set request = $select(requestList: requests."__getitem__"(i), 1: requests)
+        set key = $select(keyList: completionKeys."__getitem__"(i), 1: completionKeys)
+        set status = ..SendRequestAsync(target, request, responseRequired, key, description)
+        if $$$ISERR(status) {{
+            if '$isobject(errors) {{ set errors = ##class(%SYS.Python).Builtins().dict() }}
+            do errors."__setitem__"(i, status)
+        }}
+    }}
+    Quit errors
+}}
+
 """
 
 },
@@ -109,27 +426,7 @@ Method OnTearDown() As %Status
 
 # ______________________________________________________________________________________________ BusinessService # 
 "BusinessService": {
-
-    "OnProcessInput": 
-            """
-
-Method OnProcessInput(pInput As %RegisteredObject, Output pOutput As %RegisteredObject) As %Status
-{{
-    try{{
-        set arr = ..PythonClassObject.OnProcessInputHelper(pInput)
-        set status = arr."__getitem__"("status")
-        if arr."__getitem__"("pOutput_available") {{
-            set pOutput = arr."__getitem__"("pOutput")
-        }}
-    }} catch e{{
-        set status = $system.Status.Error(5001, e.AsSystemError())
-        $$$LOGERROR(status)
-    }}
-
-    Quit status
-}}
-
-            """,
+    **_HELPER_METHODS["BusinessService"],
     "OnTearDown": 
             """
 
@@ -143,49 +440,8 @@ Method OnTearDown() As %Status
     
 # ______________________________________________________________________________________________ BusinessProcess # 
 "BusinessProcess": {
-    # OnRequest
-    "OnRequest": 
-            """
-Method OnRequest(request As %Library.Persistent, Output response As %Library.Persistent) As %Status
-{{
-      try{{
-        set PyLib = ##class(%SYS.Python).Import(..PythonModuleOrScript)
-        set PythonClassObject = $method(PyLib,..PythonClassName, $this)
-        Set arr = PythonClassObject.OnRequestHelper(request)
-        set status = arr."__getitem__"("status")
-        if arr."__getitem__"("response_available"){{
-          set response = arr."__getitem__"("response") 
-        }}
-
-      }} catch e {{
-        set status = $system.Status.Error(5001, e.AsSystemError())
-        $$$LOGERROR("ERROR IN BP"_status)
-      }}
-    Quit status
-}}
-            """,
-
-    # OnResponse
-    "OnResponse": """
-
-Method OnResponse(request As %Library.Persistent, ByRef response As %Library.Persistent, callrequest As %Library.Persistent, callresponse As %Library.Persistent, pCompletionKey As %String) As %Status
-{{
-    try{{
-          set PyLib = ##class(%SYS.Python).Import(..PythonModuleOrScript)
-          set PythonClassObject = $method(PyLib,..PythonClassName, $this)
-          set arr = PythonClassObject.OnResponseHelper(request,response,callrequest,callresponse,pCompletionKey)
-          set status = arr."__getitem__"("status")
-          if arr."__getitem__"("response_available"){{
-            set response = arr."__getitem__"("response") 
-            }}
-      }} catch e {{
-          set status = $system.Status.Error(5001, e.AsSystemError())
-          $$$LOGERROR(status)
-      }}
-    Quit status
-}}
-
-""",
+    # OnRequest and OnResponse
+    **_HELPER_METHODS["BusinessProcess"],
         "OnTearDown": """
 
 Method OnTearDown() As %Status
@@ -198,101 +454,19 @@ Method OnTearDown() As %Status
 
 
 # ______________________________________________________________________________________________ BusinessOperation #  
-"BusinessOperation": {
-    # Any method for a business operation will have the same custom stub as follows.
-        "AnyMethod": """
-Method {MethodNameModified}(pRequest As %Library.Persistent, Output pResponse As %Library.Persistent) As %Status
-{{
-    try{{
-          Set arr = ..PythonClassObject.AnyMethodHelper(pRequest,"{MethodName}")
-          set status = arr."__getitem__"("status")
-          if arr."__getitem__"("response_available"){{
-            set pResponse = arr."__getitem__"("response") 
-            }}
-      }} catch e {{
-          set status = $system.Status.Error(5001, e.AsSystemError())
-          $$$LOGERROR(status)
-      }}
-    Quit status
-}}
-
-
-"""
-,
-"OnMessage": """
-Method OnMessage(pRequest As %Library.Persistent, Output pResponse As %Library.Persistent) As %Status
-{{
-    try{{
-          Set arr = ..PythonClassObject.OnMessageHelper(pRequest,pResponse)
-          set status = arr."__getitem__"("status")
-          if arr."__getitem__"("response_available"){{
-            set pResponse = arr."__getitem__"("response") 
-            }}
-      }} catch e {{
-          set status = $system.Status.Error(5001, e.AsSystemError())
-          $$$LOGERROR(status)
-      }}
-    Quit status
-}}
-
-
-"""
-    },
+# Any method for a business operation, and OnMessage
+"BusinessOperation": _HELPER_METHODS["BusinessOperation"],
 
 # ______________________________________________________________________________________________ OutboundAdapter #  
-    "OutboundAdapter":{
-        # Any method for an outbound adapter will have the same custom stub as follows.
-        "AnyMethod":"""
-
-Method {MethodNameModified}(arguments As %Library.RegisteredObject, Output pResponse As %Library.RegisteredObject) As %Status
-{{
-    try{{
-          Set arr = ..PythonClassObject.AnyMethodHelper(arguments,"{MethodName}")
-          set status = arr."__getitem__"("status")
-          if arr."__getitem__"("response_available"){{
-            set pResponse = arr."__getitem__"("response") 
-            }}
-      }} catch e {{
-          set status = $system.Status.Error(5001, e.AsSystemError())
-          $$$LOGERROR(status)
-      }}
-    Quit status
-}}
-
-"""
-    },
+# Any method for an outbound adapter
+"OutboundAdapter": _HELPER_METHODS["OutboundAdapter"],
 
 # ______________________________________________________________________________________________ PickleSerialize # 
-"PickleSerialize": """
-/// DO NOT EDIT. Generated by {ClassName} python class
-Class {PackageName}.{ClassName} Extends (%Persistent, Ens.Request)
-{{
-
-Property SerializedStream As %Stream.GlobalBinary;
-
-{props}
-
-{indices}
-
-/// Used by Business Process and BusinessOperation callbacks to send in a python object
-/// in case the incoming request/response if of a user defined persistable type..
-Method chunksFromIRIS(iteration As %Integer, chunkSize As %Integer = 1048576) As %SYS.Python
-{{
-    if iteration = 0 {{
-        do ..SerializedStream.Rewind()
-    }}
-    if ..SerializedStream.AtEnd {{
-        return ##class(%SYS.Python).Bytes("")
-    }}
-    Set chunkfromstream = ..SerializedStream.Read(chunkSize)
-    return ##class(%SYS.Python).Bytes(chunkfromstream)
-    
-}}
+# CompactSerialize and RecordBatch messages are stored in a binary stream, exactly like PickleSerialize ones
+"PickleSerialize": _BINARY_STREAM_MESSAGE,
+"CompactSerialize": _BINARY_STREAM_MESSAGE,
+"RecordBatch": _BINARY_STREAM_MESSAGE,
 
-
-}}
-"""
-,
 # ______________________________________________________________________________________________ JsonSerialize # 
 "JsonSerialize": """
 /// DO NOT EDIT. Generated by {ClassName} python class
@@ -305,7 +479,7 @@ Property SerializedStream As %Stream.GlobalCharacter;
 
 {indices}
 
-/// Used by Business Process and BusinessOperation callbacks to send in a python object
+""" + _COLUMN_METHODS + """/// Used by Business Process and BusinessOperation callbacks to send in a python object
 /// in case the incoming request/response if of a user defined persistable type..
 Method chunksFromIRIS(iteration As %Integer, chunkSize As %Integer = 1048576) As %String
 {{
@@ -337,6 +511,8 @@ Method OnShowJSONContents(pZenOutput As %Boolean = 0)
 """
 ,
 # ______________________________________________________________________________________________ JsonSmall # 
+# JsonSerialize variant for classes declared with inline_max: payloads up to inline_max characters are kept
+# in SerializedData, anything bigger goes to SerializedStream.
 "JsonSmall": """
 /// DO NOT EDIT. Generated by {ClassName} python class
 Class {PackageName}.{ClassName} Extends (%Persistent,Ens.Request)
@@ -344,25 +520,20 @@ Class {PackageName}.{ClassName} Extends (%Persistent,Ens.Request)
 
 Property SerializedData As %String (MAXLEN = "");
 
+Property SerializedStream As %Stream.GlobalCharacter;
+
 {props}
 
 {indices}
 
-Method chunksFromIRIS(iteration As %Integer, chunkSize As %Integer = 1048576) As %String
-{{
-    if iteration = 0 {{
-        return ..SerializedData
-    }}
-
-    return ""
-}}
-
+""" + _COLUMN_METHODS + _INLINE_JSON_METHODS + """
 
 }}
 
 """
 ,
 # ______________________________________________________________________________________________ BinarySerialized # 
+# PickleSerialize variant for classes declared with inline_max, see JsonSmall.
 "BinarySerialized": """
 /// DO NOT EDIT. Generated by {ClassName} python class
 Class {PackageName}.{ClassName} Extends (%Persistent,Ens.Request)
@@ -370,34 +541,84 @@ Class {PackageName}.{ClassName} Extends (%Persistent,Ens.Request)
 
 Property SerializedData As %Binary (MAXLEN = "");
 
+Property SerializedStream As %Stream.GlobalBinary;
+
 {props}
 
 {indices}
 
-Method chunksFromIRIS(iteration As %Integer, chunkSize As %Integer = 1048576) As %String
+""" + _COLUMN_METHODS + _INLINE_BINARY_METHODS + """
+}}
+
+"""
+,
+# ______________________________________________________________________________________________ ClaimCheckOnDelete #
+# added to message classes declared with claim_check_above or dedup, so that deleting a message (e.g. the message purge)
+# releases the file holding its payload.
+"ClaimCheckOnDelete": """
+ClassMethod %OnDelete(oid As %ObjectIdentity) As %Status [ Private, ServerOnly = 1 ]
 {{
-    if iteration = 0 {{
-        return ##class(%SYS.Python).Bytes(..SerializedData)
+    try{{
+        set message = ..%Open(oid)
+        if $isobject(message) {{
+            set pyprod = ##class(%SYS.Python).Import("intersystems_pyprod")
+            do $method(pyprod,"_release_claim_check",message)
+        }}
+    }} catch e {{
+        // a payload file that cannot be released must not stop the message from being deleted
+        $$$LOGWARNING("Could not release the claim-check file of message "_$listget(oid)_": "_e.DisplayString())
     }}
+    Quit $$$OK
+}}
+"""
+,
+# ______________________________________________________________________________________________ "MsgSubclass": """
+ # 
+"MsgSubclass": """
+/// DO NOT EDIT. Generated by {ClassName} python class
+Class {PackageName}.{ClassName} Extends ({Superclass})
+{{
+
+{props}
+
+{indices}
 
-    return ""
 }}
 
+"""
+,
+# ______________________________________________________________________________________________ JsonSmallSubclass #
+# MsgSubclass variants for subclasses declaring inline_max when their parent class does not, which add the
+# SerializedData property and the methods of JsonSmall / BinarySerialized that read it.
+"JsonSmallSubclass": """
+/// DO NOT EDIT. Generated by {ClassName} python class
+Class {PackageName}.{ClassName} Extends ({Superclass})
+{{
+
+Property SerializedData As %String (MAXLEN = "");
+
+{props}
+
+{indices}
+
+""" + _INLINE_JSON_METHODS + """
 }}
 
 """
 ,
-# ______________________________________________________________________________________________ "MsgSubclass": """
- # 
-"MsgSubclass": """
+# ______________________________________________________________________________________________ BinarySerializedSubclass #
+"BinarySerializedSubclass": """
 /// DO NOT EDIT. Generated by {ClassName} python class
 Class {PackageName}.{ClassName} Extends ({Superclass})
 {{
 
+Property SerializedData As %Binary (MAXLEN = "");
+
 {props}
 
 {indices}
 
+""" + _INLINE_BINARY_METHODS + """
 }}
 
 """
@@ -405,3 +626,9 @@ Class {PackageName}.{ClassName} Extends ({Superclass})
 # "ProductionMessage" will be generated using ClassDefinition and the above superclass. 
 # Properties can be generated for Indexes and newcols
 }
+
+
+# Host stubs of earlier versions, which read "status", "response_available" and "response" from a dict returned
+# by the python helper in up to three calls into python. Generated with --legacy-stubs for productions whose
+# classes are already deployed; the helpers keep returning the dict when they are called without packed=1.
+LEGACY_STUBS = _helper_methods(legacy=True)
@@ -10,7 +10,7 @@ import importlib
 import importlib.util
 from operator import attrgetter
 
-from ._method_stubs import STUBS
+from ._method_stubs import LEGACY_STUBS, STUBS
 
 TARGET_SUPERCLASSES = [
     "InboundAdapter",
@@ -20,12 +20,22 @@ TARGET_SUPERCLASSES = [
     "OutboundAdapter",
 ]
 
-MESSAGE_SUPERCLASSES = [ "JsonSerialize", "PickleSerialize"]
+MESSAGE_SUPERCLASSES = [ "JsonSerialize", "PickleSerialize", "CompactSerialize", "RecordBatch"]
+
+# stubs used instead of the default one when a message class is declared with inline_max
+INLINE_MESSAGE_STUBS = {"JsonSerialize": "JsonSmall", "PickleSerialize": "BinarySerialized",
+                        "CompactSerialize": "BinarySerialized", "RecordBatch": "BinarySerialized"}
+# stubs used instead of MsgSubclass for a subclass declaring inline_max when its parent class does not
+INLINE_SUBCLASS_STUBS = {"JsonSerialize": "JsonSmallSubclass", "PickleSerialize": "BinarySerializedSubclass",
+                         "CompactSerialize": "BinarySerializedSubclass", "RecordBatch": "BinarySerializedSubclass"}
+
+# Common stub of the SendMany method called by send_many, per host that has one
+SEND_MANY_STUBS = {"BusinessService": "SendMany", "BusinessOperation": "SendMany", "BusinessProcess": "SendManyBP"}
 
 # ——— local datatype map ———
 
 
-DATATYPE_MAP = {"str": "%VarString", "int": "%Integer", "bool": "%Boolean"}
+DATATYPE_MAP = {"str": "%VarString", "int": "%Integer", "bool": "%Boolean", "float": "%Double"}
 
 DATATYPE_MAP_Parameters = {"str": "STRING", "int": "INTEGER", "bool": "BOOLEAN"}
 
@@ -158,7 +168,7 @@ def get_class_module_ast(cls) -> ast.Module:
 
 # _______________________________________________________________________________________________________________________ get_class_module_ast #
 
-def detect_custom_classes(tree, loaded_module: ModuleType, output, manual, real_path: Path,args_module):
+def detect_custom_classes(tree, loaded_module: ModuleType, output, manual, real_path: Path,args_module, legacy_stubs=False):
     """
     Walk the AST and detect classes whose runtime superclasses are custom classes
     (determined through attributes on the runtime class). 
@@ -195,6 +205,8 @@ def detect_custom_classes(tree, loaded_module: ModuleType, output, manual, real_
             next_argv += ["-o", output]
         if manual:
             next_argv += ["--manual"]
+        if legacy_stubs:
+            next_argv += ["--legacy-stubs"]
         if args_module:
             next_argv += ["-m"]
             next_argv += [superclass_module[superclass_path]]
@@ -205,8 +217,27 @@ def detect_custom_classes(tree, loaded_module: ModuleType, output, manual, real_
     return result
 
 
-def generate_custom_classes(tree, script_name, folder_name, iris_package_name, output, script_path, manual, real_path, python_library, loaded_module: ModuleType,args_module):
-    classes = detect_custom_classes(tree, loaded_module, output, manual, real_path,args_module)
+def host_stubs(hostname, legacy_stubs=False):
+    """Return the method stubs of a host, with those of LEGACY_STUBS in place of the others for --legacy-stubs."""
+    stubs = STUBS.get(hostname, {})
+    if legacy_stubs:
+        stubs = {**stubs, **LEGACY_STUBS.get(hostname, {})}
+    return stubs
+
+
+def on_response_stub(node: ast.ClassDef, super_stubs):
+    """
+    The OnResponse stub of a business process that does not define OnResponse / on_response itself. scatter
+    and a generator OnRequest get their responses through OnResponse, so every business process needs it.
+    """
+    for child in node.body:
+        if isinstance(child, ast.FunctionDef) and snake_to_pascal(child.name) == "OnResponse":
+            return ""
+    return super_stubs["OnResponse"].format()
+
+
+def generate_custom_classes(tree, script_name, folder_name, iris_package_name, output, script_path, manual, real_path, python_library, loaded_module: ModuleType,args_module, legacy_stubs=False):
+    classes = detect_custom_classes(tree, loaded_module, output, manual, real_path,args_module, legacy_stubs)
     if not classes:
         return
     class_tmpl = STUBS.get("ClassDefinition")
@@ -242,7 +273,9 @@ def generate_custom_classes(tree, script_name, folder_name, iris_package_name, o
             )
 
         methods = [oninit]
-        super_stubs = STUBS.get(hostname, {})
+        if hostname in SEND_MANY_STUBS:
+            methods.append(STUBS["Common"][SEND_MANY_STUBS[hostname]].format())
+        super_stubs = host_stubs(hostname, legacy_stubs)
         PascalName = ""
 
         for child in node.body:
@@ -271,6 +304,8 @@ def generate_custom_classes(tree, script_name, folder_name, iris_package_name, o
                     ScriptName=script_name,
                 )
                 methods.append(content_stub)
+        if hostname == "BusinessProcess":
+            methods.append(on_response_stub(node, super_stubs))
 
         methods_combined = "\n".join(methods)
 
@@ -531,7 +566,7 @@ def find_ossubclasses(tree):
     return result
 
 
-def generate_os_classes(tree, script_name, folder_name, iris_package_name, output, script_path, manual, real_path, python_library):
+def generate_os_classes(tree, script_name, folder_name, iris_package_name, output, script_path, manual, real_path, python_library, legacy_stubs=False):
     classes = find_ossubclasses(tree)
     class_tmpl = STUBS.get("ClassDefinition")
     common_oninit = STUBS.get("Common", {}).get("OnInit", "")
@@ -566,7 +601,9 @@ def generate_os_classes(tree, script_name, folder_name, iris_package_name, outpu
             )
 
         methods = [oninit]
-        super_stubs = STUBS.get(supercls, {})
+        if supercls in SEND_MANY_STUBS:
+            methods.append(STUBS["Common"][SEND_MANY_STUBS[supercls]].format())
+        super_stubs = host_stubs(supercls, legacy_stubs)
         PascalName = ""
 
         for child in node.body:
@@ -595,6 +632,8 @@ def generate_os_classes(tree, script_name, folder_name, iris_package_name, outpu
                     ScriptName=script_name,
                 )
                 methods.append(content_stub)
+        if supercls == "BusinessProcess":
+            methods.append(on_response_stub(node, super_stubs))
 
         methods_combined = "\n".join(methods)
 
@@ -630,6 +669,12 @@ def generate_os_classes(tree, script_name, folder_name, iris_package_name, outpu
 
 def props_and_indices_from_msg_class(node: ast.ClassDef):
     props, indices = [], []
+    # annotations of the class body, used for the datatype of RecordBatch summary columns
+    annotations = {
+        stmt.target.id: ast.unparse(stmt.annotation)
+        for stmt in node.body
+        if isinstance(stmt, ast.AnnAssign) and isinstance(stmt.target, ast.Name)
+    }
 
     for stmt in node.body:
         ann = None
@@ -677,6 +722,18 @@ def props_and_indices_from_msg_class(node: ast.ClassDef):
         if dtype is None and ann is not None:
             dtype = ast.unparse(ann)
 
+        summary = kw.get("summary")
+        if dtype is None and summary is not None:
+            # the datatype of the summary, not of the record field: the sum of a bool field is an int. Summaries
+            # over types they cannot be computed for are rejected by RecordBatch when the module is loaded
+            of_type = annotations.get(kw.get("of"))
+            if summary == "count":
+                dtype = "int"
+            elif summary == "sum":
+                dtype = "float" if of_type == "float" else "int"
+            else:
+                dtype = of_type
+
         # build the property description line
         if desc:
             props.append(f"/// {desc}")
@@ -700,7 +757,7 @@ def props_and_indices_from_msg_class(node: ast.ClassDef):
 
     return props, indices
 
-def find_custom_message_classes(tree, loaded_module: ModuleType, output, manual, real_path: Path,args_module):
+def find_custom_message_classes(tree, loaded_module: ModuleType, output, manual, real_path: Path,args_module, legacy_stubs=False):
     result = []
     superclass_path_list = set()
     superclass_module = {}
@@ -725,7 +782,7 @@ def find_custom_message_classes(tree, loaded_module: ModuleType, output, manual,
                     if superclass_path not in _visited_paths_msgs:
                         superclass_path_list.add(superclass_path)
                         superclass_module[superclass_path] = str(superclass.__module__)
-                    result.append((node.name, superclass_name, node, serializer_class))
+                    result.append((node.name, superclass_name, node, serializer_class, superclass))
 
     for superclass_path in superclass_path_list:
         if superclass_path in _visited_paths_msgs:
@@ -735,6 +792,8 @@ def find_custom_message_classes(tree, loaded_module: ModuleType, output, manual,
             next_argv += ["-o", output]
         if manual:
             next_argv += ["--manual"]
+        if legacy_stubs:
+            next_argv += ["--legacy-stubs"]
         if args_module:
             next_argv += ["-m"]
             next_argv += [superclass_module[superclass_path]]
@@ -744,18 +803,19 @@ def find_custom_message_classes(tree, loaded_module: ModuleType, output, manual,
 
     return result
 
-def generate_custom_msg_wrappers(tree, script_name, folder_name, iris_package_name, python_library, output, script_path, manual, real_path, loaded_module: ModuleType,args_module):
-    classes = find_custom_message_classes(tree, loaded_module, output, manual, real_path,args_module)
+def generate_custom_msg_wrappers(tree, script_name, folder_name, iris_package_name, python_library, output, script_path, manual, real_path, loaded_module: ModuleType,args_module, legacy_stubs=False):
+    classes = find_custom_message_classes(tree, loaded_module, output, manual, real_path,args_module, legacy_stubs)
     if not classes:
         return
 
     all_classes = {}
-    for cls, superclass_name, node, serializer in classes:
+    for cls, superclass_name, node, serializer, superclass in classes:
         props_lines, indices = props_and_indices_from_msg_class(node)
         props_block = "\n".join(props_lines) if props_lines else ""
+        props_block += message_methods_block(node)
         indices_block = "\n".join(indices) if indices else ""
 
-        stub = STUBS.get("MsgSubclass")
+        stub = STUBS.get(message_subclass_stub_name(serializer, superclass, node))
         if not stub:
             print("Missing MsgWrapperSuperClass stub for " + superclass_name)
             continue
@@ -788,11 +848,37 @@ def generate_custom_msg_wrappers(tree, script_name, folder_name, iris_package_na
             load_to_iris(all_classes[cls_name], cls_name)
 
 
+def class_keywords(node: ast.ClassDef):
+    """Return the keyword arguments in the class statement, e.g. class Msg(JsonSerialize, inline_max=2048)"""
+    return {kw.arg: eval_node(kw.value) for kw in node.keywords if kw.arg is not None}
+
+
+def message_methods_block(node: ast.ClassDef):
+    """ObjectScript methods added to the generated class for some class keywords, after its properties."""
+    keywords = class_keywords(node)
+    if keywords.get("claim_check_above") is not None or keywords.get("dedup"):
+        return STUBS["ClaimCheckOnDelete"].format()
+    return ""
+
+
+def message_stub_name(superclass_name, node: ast.ClassDef):
+    if class_keywords(node).get("inline_max") and superclass_name in INLINE_MESSAGE_STUBS:
+        return INLINE_MESSAGE_STUBS[superclass_name]
+    return superclass_name
+
+
+def message_subclass_stub_name(serializer, superclass, node: ast.ClassDef):
+    # the generated class of the parent only has SerializedData when inline_max was set on it or its parents
+    if class_keywords(node).get("inline_max") and not superclass._inline_max and serializer in INLINE_SUBCLASS_STUBS:
+        return INLINE_SUBCLASS_STUBS[serializer]
+    return "MsgSubclass"
+
+
 def find_message_classes(source):
     """
     Parse the given Python source, walk the AST, and return a list of
     (class_name, matched_base) for every class that directly inherits from
-    PickleSerialize, JsonSerialize.
+    PickleSerialize, JsonSerialize, CompactSerialize, RecordBatch.
     """
     tree = ast.parse(source)
     result = []
@@ -818,9 +904,10 @@ def generate_msg_wrappers(tree, script_name, folder_name, iris_package_name, pyt
 
         props_lines, indices = props_and_indices_from_msg_class(node)
         props_block = "\n".join(props_lines) if props_lines else ""
+        props_block += message_methods_block(node)
         indices_block = "\n".join(indices) if indices else ""
 
-        stub = STUBS.get(superclass_name)
+        stub = STUBS.get(message_stub_name(superclass_name, node))
         if not stub:
             print("Missing MsgWrapperSuperClass stub for " + superclass_name)
             continue
@@ -877,6 +964,7 @@ def main(argv: list[str] = None):
     parser.add_argument("--manual", action="store_true", help="Run in manual mode")
     parser.add_argument("-m", "--module", help="Dotted module to analyze (e.g. pkg.sub.mod). If set, ignore positional file.")
     parser.add_argument("-s", "--source-root", help="Project source root used to compute absolute module names when loading from a file", dest="sourceroot")
+    parser.add_argument("--legacy-stubs", action="store_true", help="Generate host methods that read the python helper's result as a dict, as earlier versions did")
     parser.add_argument("input_script", nargs="?", help="Path to a .py file (used when -m/--module is not provided)")
     args = parser.parse_args(argv)
 
@@ -976,7 +1064,8 @@ def main(argv: list[str] = None):
         args.manual,
         real_path,
         loaded_module,
-        args.module
+        args.module,
+        args.legacy_stubs,
     )
 
     # Ens.* subclasses
@@ -990,6 +1079,7 @@ def main(argv: list[str] = None):
         args.manual,
         real_path,
         python_library,
+        args.legacy_stubs,
     )
 
     # Custom subclasses of your runtime types
@@ -1004,7 +1094,8 @@ def main(argv: list[str] = None):
         real_path,
         python_library,
         loaded_module,
-        args.module
+        args.module,
+        args.legacy_stubs,
     )
 
 
@@ -1,8 +1,22 @@
 import ast
+import functools
+import hashlib
 import importlib
 import inspect
+import io
+import json
+import mmap
+import os
 import pickle
+import struct
 import sys
+import tempfile
+import types
+import uuid
+import zlib
+from array import array
+from collections import namedtuple
+from itertools import accumulate, chain, islice
 
 import iris
 
@@ -17,6 +31,27 @@ def _add_to_sys_path(path: str) -> None:
 # increasing this to a higher value can lead to <MAXSTRING> error in IRIS
 BELOW_MAX_STRING = 3 * 1024 * 1024
 
+# lists and dicts longer than this are json encoded this many items at a time
+JSON_ENCODE_BATCH = 1024
+
+# strings longer than this are json encoded this many characters at a time
+JSON_ENCODE_STRING = 1024 * 1024
+
+# payloads that are not plain JSON text or a pickle start with this, followed by one byte for the kind of
+# payload. Neither JSON text nor a pickle can start with a NUL
+_ENVELOPE_MAGIC = b"\x00PY"
+_ZLIB_ENVELOPE = _ENVELOPE_MAGIC + b"Z"
+_OUT_OF_BAND_ENVELOPE = _ENVELOPE_MAGIC + b"B"
+_CLAIM_CHECK_ENVELOPE = _ENVELOPE_MAGIC + b"C"
+
+# bytes, bytearray and array.array objects of at least this many bytes are pickled out-of-band by
+# PickleSerialize classes declared with out_of_band=True
+OUT_OF_BAND_MIN = 64 * 1024
+
+# message classes declared with dedup=True and without claim_check_above store payloads larger than this in the
+# claim-check store. Smaller payloads are cheaper to write again than to share
+DEDUP_ABOVE = 4096
+
 def snake_to_pascal(name: str) -> str:
     # Check if the string is in snake_case
     if "_" in name and (name.lower() == name or name.upper() == name):
@@ -116,17 +151,26 @@ class IRISProperty:
         self.default = default
         self.settings = settings
         self.name = None
+        self.iris_name = None
 
     def __set_name__(self, owner, name):
         self.name = name
+        self.iris_name = snake_to_pascal(name)
 
     def __get__(self, instance, owner):
         if instance is None:
             return self
-        return getattr(instance.iris_host_object, snake_to_pascal(self.name), self.default)
+        # hosts that set snapshot_settings keep the values read at construction in _settings
+        settings = instance.__dict__.get("_settings")
+        if settings is not None:
+            return settings[self.name]
+        return getattr(instance.iris_host_object, self.iris_name, self.default)
 
     def __set__(self, instance, value):
-        setattr(instance.iris_host_object, snake_to_pascal(self.name), value)
+        setattr(instance.iris_host_object, self.iris_name, value)
+        settings = instance.__dict__.get("_settings")
+        if settings is not None:
+            settings[self.name] = value
 
 
 
@@ -187,10 +231,16 @@ class AdapterNamesToPascal:
 
     If the forwarded attribute is callable, the wrapper will call it with a SINGLE
     argument: (args, kwargs).
+
+    The wrapper built for a method is stored on the proxy under the requested name, so later calls find it
+    without going through __getattr__ or into IRIS again. Attributes that are not callable are read from the
+    adapter object on every access.
     """
     def __init__(self, adapter_object):
         # Avoid recursion by writing directly to __dict__
         self.__dict__['_adapter_object'] = adapter_object
+        # iris.ref passed to the adapter methods for their response, reused by every call of this proxy
+        self.__dict__['_response'] = None
 
     def __getattr__(self, name):
         """
@@ -201,21 +251,27 @@ class AdapterNamesToPascal:
 
         attr = getattr(self._adapter_object, pascal_name)
 
-
-
         if callable(attr):
+            proxy_dict = self.__dict__
+
             # Wrap method calls so args pass through unchanged
             def method(*args, **kwargs):
                 arguments = (args, kwargs)
-                
-                response = iris.ref()
+
+                # taken off the proxy while in use, in case the adapter method calls back into it
+                response = proxy_dict['_response']
+                if response is None:
+                    response = iris.ref()
+                else:
+                    proxy_dict['_response'] = None
                 # arguments can be passed in as a single python object as the boundary between 
                 # BO and out adapter can handle %SYS.Python objects..
-                status = attr(arguments,response)
-
-                response_value = response.value
-                response.value = None
-                del response
+                try:
+                    status = attr(arguments,response)
+                    response_value = response.value
+                finally:
+                    response.value = None
+                    proxy_dict['_response'] = response
 
                 if isinstance(response_value, tuple):
                     return (status, *response_value)
@@ -227,7 +283,7 @@ class AdapterNamesToPascal:
             method.__qualname__ = f"{type(self).__name__}.{name}"
             method.__doc__ = getattr(attr, "__doc__", None)
 
-
+            proxy_dict[name] = method
             return method
 
         return attr
@@ -241,7 +297,6 @@ class AdapterNamesToPascal:
 
 
 
-
 class Column:
     """
     Used in message classes to define class attributes as independent columns for the given field in IRIS database.
@@ -275,9 +330,37 @@ class Column:
 _BaseClass_registry: dict[str, type] = {}
 
 
+def _resolve_callback(cls, *names):
+    """
+    Return the first of the methods names defined on cls as a function to call with the instance as first
+    argument, or None if the class defines none of them.
+    """
+    for name in names:
+        attribute = inspect.getattr_static(cls, name, None)
+        if attribute is None:
+            continue
+        if isinstance(attribute, types.FunctionType):
+            return attribute
+        # staticmethods, classmethods and other descriptors are bound on every call
+        return lambda self, *args, **kwargs: getattr(self, name)(*args, **kwargs)
+    return None
+
+
 # Intermediate layer for IRIS roles
 # Base class
 class BaseClass:
+    """
+    Set snapshot_settings = True on a subclass to read every IRISProperty from the IRIS host object once, when
+    the python object is built in OnInit, instead of on every access. Assigning an IRISProperty still writes it
+    to IRIS and updates the snapshot. Updating the production restarts the host and so takes a new snapshot;
+    call refresh_settings() to read the values again after they were changed on the IRIS side in the meantime.
+    """
+
+    snapshot_settings = False
+
+    # whether the IRIS class has the SendMany method used by send_many, which classes generated by older
+    # versions do not. None until send_many is first called
+    _send_many_stub = None
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
@@ -296,41 +379,132 @@ class BaseClass:
         # Cache it on the class object, in the class’s internal __dict__, for instant lookup later:
         cls._iris_package = pkg
         cls._fullname = cls._iris_package + "." + cls.__name__
+        # functions of the methods called by name through AnyMethodHelper, filled by _method on first use
+        cls._methods = {}
+        # iris.ref objects passed to IRIS for output arguments, reused by every instance of the class in this
+        # job. Each is taken off the list for the duration of one call and put back with its value cleared.
+        cls._refs = []
+        properties = {}
+        for klass in reversed(cls.__mro__):
+            for name, value in vars(klass).items():
+                if isinstance(value, IRISProperty):
+                    properties[name] = value
+                else:
+                    properties.pop(name, None)
+        cls._iris_properties = tuple(properties.values())
         # register every user subclass by its __name__. This is later used in Host classes for
         # generating objects dynamically at runtime based on incoming message type...
         _BaseClass_registry[cls._fullname] = cls
 
     def __init__(self, iris_host_object):
         self.iris_host_object = iris_host_object
+        if self.snapshot_settings:
+            self.refresh_settings()
+
+    def refresh_settings(self):
+        """
+        Read every IRISProperty from the IRIS host object again into the snapshot of snapshot_settings. Does
+        nothing on hosts without snapshot_settings, which read the IRIS host object on every access already.
+        """
+        if not self.snapshot_settings:
+            return
+        iris_host_object = self.iris_host_object
+        self._settings = {
+            prop.name: getattr(iris_host_object, prop.iris_name, prop.default) for prop in type(self)._iris_properties
+        }
+
+    @classmethod
+    def _method(cls, name):
+        """Resolve the method called by name through AnyMethodHelper and add it to cls._methods."""
+        function = _resolve_callback(cls, name)
+        if function is None:
+            raise AttributeError(f"{cls.__name__!r} object has no attribute {name!r}")
+        cls._methods[name] = function
+        return function
 
     def _createmessage(self, message_object, *args, **kwargs):
+        iris_class = message_object.__class__
         try:
-            
-            # this removes iris. which is in front of the incoming class name from iris backend
-            module_name = message_object.__class__.__module__[5:]  
-            class_name = message_object.__class__.__name__
-            saved_class_name = module_name + "." + class_name
-            if saved_class_name not in _ProductionMessage_registry:
-                # in coming message_object is already an objectscript data type class
-                return message_object
-
-            MsgCls = _ProductionMessage_registry[module_name + "." + class_name]
-            if issubclass(MsgCls, PickleSerialize):
-                return unpickle_binary(message_object,MsgCls)
-
+            loader = _message_loaders[iris_class]
         except KeyError:
-            raise LookupError(f"No messageclass named {class_name!r} registered")
-        return MsgCls(iris_message_object=message_object)
+            loader = _message_loaders[iris_class] = _message_loader(iris_class)
+        if loader is None:
+            # in coming message_object is already an objectscript data type class
+            return message_object
+        return loader(message_object)
+
+    def _helper_result(self, result, packed, key="response"):
+        """
+        Shape the result of a host callback for the generated ObjectScript stub.
+
+        The stubs generated by this version call the helpers with packed=1 and get back the status alone, the
+        response alone when the status is OK and the response is an IRIS object, or a (status, response) tuple
+        otherwise, which the stub tells apart with $isobject and $classname in a single call into python.
+        Stubs generated by earlier versions, or with --legacy-stubs, read the dict returned when packed is not set.
+        """
+        if not isinstance(result, (tuple, list)):
+            if packed:
+                return result
+            return {"status": result, key + "_available": 0}
+        status, response = result
+        response = self.request_to_send(response)
+        if not packed:
+            return {key: response, "status": status, key + "_available": 1}
+        if (status == 1 or status == "1") and type(response).__module__.startswith("iris."):
+            return response
+        return status, response
 
     def request_to_send(self, request):
         if request == "":
             return ""
-        if getattr(request, "_fullname", None):
+        if isinstance(request, ProductionMessage):
             request.update_iris_message_object()
             return request.iris_message_object
         else: 
             return request
 
+    def _send_many(self, target_or_targets, requests, *arguments):
+        """
+        Send requests with SendRequestAsync and return their statuses in order. target_or_targets, requests and
+        the arguments may each be a list with one item per request; any other value is used for every request.
+        Each distinct message is serialized once, however many times it appears in requests.
+        """
+        values = [list(value) if isinstance(value, tuple) else value for value in (target_or_targets, requests, *arguments)]
+        lists = [value for value in values if isinstance(value, list)]
+        if not lists:
+            raise TypeError("send_many needs a list of targets or a list of requests")
+        count = len(lists[0])
+        if any(len(value) != count for value in lists):
+            raise ValueError("the lists passed to send_many must have one item per request")
+        if not count:
+            return []
+
+        if isinstance(values[1], list):
+            # a new list, so that the caller's list of requests is left as it was
+            sent = {}
+            for request in values[1]:
+                key = id(request)
+                if key not in sent:
+                    sent[key] = self.request_to_send(request)
+            values[1] = [sent[id(request)] for request in values[1]]
+        else:
+            values[1] = self.request_to_send(values[1])
+
+        cls = type(self)
+        if cls._send_many_stub is None:
+            cls._send_many_stub = bool(iris.cls("%Dictionary.CompiledMethod")._ExistsId(cls._fullname + "||SendMany"))
+        if cls._send_many_stub:
+            errors = self.iris_host_object.SendMany(count, *values)
+            statuses = [1] * count
+            if errors:
+                for position, status in errors.items():
+                    statuses[position] = status
+            return statuses
+        return [
+            self.iris_host_object.SendRequestAsync(*(value[i] if isinstance(value, list) else value for value in values))
+            for i in range(count)
+        ]
+
     def fullname(self):
         return self._fullname
 
@@ -346,41 +520,34 @@ class BusinessService(BaseClass):
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
         cls._hostname = "BusinessService"
+        cls._on_process_input = _resolve_callback(cls, "OnProcessInput", "on_process_input")
 
-    def OnProcessInputHelper(self, input):
-        # This must return a status and an output in an array
-        if hasattr(self, "OnProcessInput"):
-            result = self.OnProcessInput(input)
-        elif hasattr(self, "on_process_input"):
-            result = self.on_process_input(input)
-        else:
+    def OnProcessInputHelper(self, input, packed=False):
+        on_process_input = type(self)._on_process_input
+        if on_process_input is None:
             raise NotImplementedError("Subclass must implement OnProcessInput or on_process_input")
-     
-        if isinstance(result, (tuple, list)):
-            status, output = result
-            return {"status": status,"pOutput": self.request_to_send(output),"pOutput_available": 1}
-        else:
-            status = result
-            return {"status": status, "pOutput_available": 0}
+        return self._helper_result(on_process_input(self, input), packed, "pOutput")
 
     def SendRequestSync(self, target_dispatch_name, request, timeout=-1, description=""):
-        response = iris.ref()
-        send_sync_handling = iris.ref()
-        status = self.iris_host_object.SendRequestSync(
-            target_dispatch_name,
-            self.request_to_send(request),
-            response,
-            timeout,
-            description,
-            send_sync_handling,
-        )
-
-        response_value = response.value
-        response.value = None
-        send_sync_handling_value = send_sync_handling.value
-        send_sync_handling.value = None
-        del response
-        del send_sync_handling
+        refs = self._refs
+        response = refs.pop() if refs else iris.ref()
+        send_sync_handling = refs.pop() if refs else iris.ref()
+        try:
+            status = self.iris_host_object.SendRequestSync(
+                target_dispatch_name,
+                self.request_to_send(request),
+                response,
+                timeout,
+                description,
+                send_sync_handling,
+            )
+            response_value = response.value
+            send_sync_handling_value = send_sync_handling.value
+        finally:
+            response.value = None
+            send_sync_handling.value = None
+            refs.append(response)
+            refs.append(send_sync_handling)
 
         if send_sync_handling_value is not None:
             if response_value is not None:
@@ -407,59 +574,81 @@ class BusinessService(BaseClass):
     def send_request_async(self, target_dispatch_name, request, description=""):
         return self.SendRequestAsync(target_dispatch_name, request, description)
 
+    def send_many(self, target_or_targets, requests, description=""):
+        """
+        Send many requests asynchronously with one call into IRIS and return the status of each, in order.
+        Pass one target and a list of requests, a list of targets and one request, or two lists of equal length.
+        """
+        return self._send_many(target_or_targets, requests, description)
+
 
 class BusinessProcess(BaseClass):
+    """
+    A new IRIS business process instance is created for every incoming request and it is saved between
+    OnRequest and any OnResponse callbacks. By default, the python object handling these callbacks is also
+    rebuilt on every callback.
+
+    Set cache_python_instance = True on the subclass to build the python object once per job and reuse it
+    for every callback handled by that job. In this mode:
+     - state that must survive between OnRequest and OnResponse of one request must be kept in IRISProperty
+       attributes, as those live on the persisted IRIS business process instance.
+     - plain python attributes (self.x = ...) are shared by every request handled by the job. Only use them
+       for things like connections, caches or compiled lookups that do not belong to a single request.
+     - self.iris_host_object is rebound to the current IRIS instance before every callback, and set to None
+       once it returns.
+    """
+
+    cache_python_instance = False
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
         cls._hostname = "BusinessProcess"
+        cls._on_request = _resolve_callback(cls, "OnRequest", "on_request")
+        cls._on_response = _resolve_callback(cls, "OnResponse", "on_response")
+        cls._on_gather = _resolve_callback(cls, "OnGather", "on_gather")
 
-    def OnRequestHelper(self, request):
-        python_request = self._createmessage(message_object=request)
-
-        if hasattr(self, "OnRequest"):
-            result = self.OnRequest(python_request)
-        elif hasattr(self, "on_request"):
-            result = self.on_request(python_request)
-        else:
-            raise NotImplementedError("Subclass must implement OnRequest or on_request")
-    
-        if isinstance(result, (tuple, list)):
-            status, response = result
-            return {
-                "response": self.request_to_send(response),
-                "status": status,
-                "response_available": 1,
-            }
-        else:
-            status = result
-            return {"status": status, "response_available": 0}
-
-    def OnResponseHelper(self, request, response, call_request, call_response, completion_key):
-
-        python_request = self._createmessage(message_object=request)
-        python_response = self._createmessage(message_object=response)
-        python_call_request = self._createmessage(message_object=call_request)
-        python_call_response = self._createmessage(message_object=call_response)
-
-
-        if hasattr(self, "OnResponse"):
-            result = self.OnResponse(python_request,python_response,python_call_request,python_call_response,completion_key)
-        elif hasattr(self, "on_response"):
-            result = self.on_response(python_request,python_response,python_call_request,python_call_response,completion_key)
-        else:
-            raise NotImplementedError("Subclass must implement OnResponse or on_response")
-
-        if isinstance(result, (tuple, list)):
-            status, response = result
-            return {
-                "response": self.request_to_send(response),
-                "status": status,
-                "response_available": 1,
-            }
-        else:
-            status = result
-            return {"status": status, "response_available": 0}
+    def OnRequestHelper(self, request, packed=False):
+        try:
+            on_request = type(self)._on_request
+            if on_request is None:
+                raise NotImplementedError("Subclass must implement OnRequest or on_request")
+            result = on_request(self, self._createmessage(message_object=request))
+            if isinstance(result, types.GeneratorType):
+                result = self._run_steps(result, [], uuid.uuid4().hex)
+            return self._helper_result(result, packed)
+        finally:
+            self._release_host_object()
+
+    def OnResponseHelper(self, request, response, call_request, call_response, completion_key, packed=False):
+        try:
+            if isinstance(completion_key, str):
+                if completion_key.startswith(_STEP_KEY):
+                    return self._helper_result(self._resume_steps(request, completion_key, call_response), packed)
+                if completion_key.startswith(_GATHER_KEY):
+                    return self._helper_result(self._gather(completion_key, call_response), packed)
+
+            on_response = type(self)._on_response
+            if on_response is None:
+                # as Ens.BusinessProcess does when OnResponse is not overridden
+                return self._helper_result(self.OKStatus(), packed)
+
+            python_request = self._createmessage(message_object=request)
+            python_response = self._createmessage(message_object=response)
+            python_call_request = self._createmessage(message_object=call_request)
+            python_call_response = self._createmessage(message_object=call_response)
+
+            result = on_response(self,python_request,python_response,python_call_request,python_call_response,completion_key)
+            return self._helper_result(result, packed)
+        finally:
+            self._release_host_object()
+
+    def _release_host_object(self):
+        """
+        Drop the IRIS business process instance once a callback returns. _business_process_object binds it again
+        for every callback; holding on to it would keep its OREF open in this job, and %OpenId of that instance
+        would then return this copy instead of the one another job of the pool saved in the meantime.
+        """
+        self.iris_host_object = None
 
     def SendRequestAsync(self,target_dispatch_name,request,response_required=1,completion_key=0,description=""):
         status = self.iris_host_object.SendRequestAsync(target_dispatch_name,self.request_to_send(request),response_required,completion_key,description)
@@ -468,13 +657,216 @@ class BusinessProcess(BaseClass):
     def send_request_async(self,target_dispatch_name,request,response_required=1,completion_key=0,description=""):
         return self.SendRequestAsync(target_dispatch_name,request,response_required,completion_key,description)
 
-    def SendRequestSync(self, target_dispatch_name, request, timeout=-1, description=""):
-        response = iris.ref()
-        status = self.iris_host_object.SendRequestSync(target_dispatch_name,self.request_to_send(request),response,timeout,description)
+    def send_many(self, target_or_targets, requests, response_required=1, completion_key=0, description=""):
+        """
+        Send many requests asynchronously with one call into IRIS and return the status of each, in order.
+        Pass one target and a list of requests, a list of targets and one request, or two lists of equal length.
+        completion_key may also be a list with one key per request.
+        """
+        return self._send_many(target_or_targets, requests, response_required, completion_key, description)
+
+    def scatter(self, target_or_targets, requests, timeout=-1, description=""):
+        """
+        Send requests asynchronously, like send_many, and call OnGather / on_gather once with the list of their
+        responses, in the order of the requests, when all of them have arrived or timeout seconds have passed.
+        Responses that did not arrive in time, and requests that could not be sent, are None in that list, and
+        a warning is logged for every request that could not be sent.
+
+        The progress is kept in the PythonGatherState property of the IRIS business process, so one scatter can
+        be outstanding per business process instance. Returns OK while responses are pending. When no request
+        was sent, because the list is empty or every send failed, OnGather / on_gather is called right away and
+        scatter returns its result. Returns the error status of SetTimer, before anything is sent, if the timer
+        of timeout cannot be set.
+        """
+        if type(self)._on_gather is None:
+            raise NotImplementedError("Subclass must implement OnGather or on_gather to use scatter")
+        if self.iris_host_object.PythonGatherState:
+            raise RuntimeError("the previous scatter of this business process is still waiting for responses")
+        if isinstance(requests, (list, tuple)):
+            count = len(requests)
+        elif isinstance(target_or_targets, (list, tuple)):
+            count = len(target_or_targets)
+        else:
+            raise TypeError("scatter needs a list of targets or a list of requests")
+        if not count:
+            return type(self)._on_gather(self, [])
+        timer = timeout is not None and timeout >= 0
+        if timer:
+            status = self.iris_host_object.SetTimer(timeout, _GATHER_TIMEOUT_KEY)
+            if status != 1 and status != "1":
+                return status
+        keys = [_GATHER_KEY + str(position) for position in range(count)]
+        statuses = self.send_many(target_or_targets, requests, 1, keys, description)
+
+        pending = count
+        for position, status in enumerate(statuses):
+            if status != 1 and status != "1":
+                # its response stays None in the list passed to on_gather
+                IRISLog.Warning(f"scatter could not send request {position}: {iris.system.Status.GetErrorText(status)}")
+                pending -= 1
+        if not pending:
+            if timer:
+                self.iris_host_object.ClearAllPendingResponses()
+            return type(self)._on_gather(self, [None] * count)
+        # responses are kept as [IRIS class name, id] by position until all of them are in
+        self.iris_host_object.PythonGatherState = json.dumps(
+            {"count": count, "pending": pending, "timer": timer, "responses": {}}, separators=(",", ":")
+        )
+        return self.OKStatus()
+
+    def _gather(self, completion_key, call_response):
+        """Record a response of the outstanding scatter, and call on_gather once all of them are in."""
+        saved = self.iris_host_object.PythonGatherState
+        if not saved:
+            # a response that arrived after the scatter was gathered on timeout
+            return self.OKStatus()
+        state = json.loads(saved)
+        if completion_key != _GATHER_TIMEOUT_KEY:
+            state["responses"][completion_key[len(_GATHER_KEY):]] = self._response_reference(call_response)
+            state["pending"] -= 1
+            if state["pending"]:
+                self.iris_host_object.PythonGatherState = json.dumps(state, separators=(",", ":"))
+                return self.OKStatus()
+
+        self.iris_host_object.PythonGatherState = ""
+        if state["timer"]:
+            # the timer, or the responses still missing at the timeout, would otherwise keep the process open
+            self.iris_host_object.ClearAllPendingResponses()
+        responses = state["responses"]
+        results = [self._open_response(responses.get(str(position))) for position in range(state["count"])]
+        return type(self)._on_gather(self, results)
+
+    @staticmethod
+    def _response_reference(call_response):
+        """The [IRIS class name, id] of a response received by OnResponse, or None when there is none."""
+        if call_response is None or call_response == "":
+            return None
+        return [call_response._ClassName(1), call_response._Id()]
+
+    def _open_response(self, reference):
+        """The response saved with _response_reference, opened again from IRIS."""
+        if reference is None:
+            return None
+        iris_class_name, iris_id = reference
+        return self._createmessage(message_object=iris.cls(iris_class_name)._OpenId(iris_id))
+
+    def _run_steps(self, steps, completed, key, live=False):
+        """
+        Run the generator returned by a generator OnRequest / on_request up to its next yield and send the
+        requests it yields there with SendRequestAsync. A live generator, kept in this job from the previous
+        step, is sent the responses of the last step in completed. Otherwise the responses of every step in
+        completed are sent back into it first, without sending their requests again, and each of those steps
+        must yield the targets it yielded the first time.
+
+        A yield of (target, request) gets the response back, and a yield of a list of them sends them in
+        parallel and gets back the list of their responses. Returns the result of the generator once it
+        returns, and OK while it waits for responses.
+        """
+        try:
+            if live:
+                yielded = steps.send(self._step_responses(completed[-1]))
+            else:
+                yielded = next(steps)
+                for step in completed:
+                    if int(isinstance(yielded, list)) != step["p"] or _step_targets(yielded) != step["t"]:
+                        steps.close()
+                        self.iris_host_object.PythonStepState = ""
+                        raise RuntimeError(
+                            f"a generator OnRequest yielded the targets {_step_targets(yielded)} when it was resumed, "
+                            f"where it had yielded {step['t']}; it must yield the same calls for the same responses"
+                        )
+                    yielded = steps.send(self._step_responses(step))
+            while isinstance(yielded, list) and not yielded:
+                completed.append({"p": 1, "r": [], "t": []})
+                yielded = steps.send([])
+        except StopIteration as stop:
+            self.iris_host_object.PythonStepState = ""
+            return self.OKStatus() if stop.value is None else stop.value
+
+        parallel = isinstance(yielded, list)
+        calls = yielded if parallel else [yielded]
+        if not all(isinstance(call, tuple) and len(call) == 2 for call in calls):
+            steps.close()
+            self.iris_host_object.PythonStepState = ""
+            raise TypeError("a generator OnRequest must yield (target, request) or a list of them")
+        targets = [target for target, _ in calls]
+        statuses = self.send_many(
+            targets,
+            [request for _, request in calls],
+            1,
+            [_STEP_KEY + str(position) for position in range(len(calls))],
+        )
+        for status in statuses:
+            if status != 1 and status != "1":
+                steps.close()
+                self.iris_host_object.PythonStepState = ""
+                return status
 
-        response_value = response.value
-        response.value = None
-        del response
+        # responses are kept as [IRIS class name, id] by step, and by position within the current step. The token
+        # tells the job holding the generator whether the saved state is still the one it left
+        token = uuid.uuid4().hex
+        self.iris_host_object.PythonStepState = json.dumps(
+            {
+                "key": key, "token": token, "steps": completed, "p": int(parallel), "t": _step_targets(yielded),
+                "pending": len(calls), "current": [None] * len(calls),
+            },
+            separators=(",", ":"),
+        )
+        # the IRIS instance must not stay open in this job while the generator waits, or %OpenId would return this
+        # copy instead of the one saved by another job of the pool. It is bound again when the generator resumes
+        self.iris_host_object = None
+        _step_generators[key] = (steps, self, token)
+        if len(_step_generators) > _STEP_GENERATORS_MAX:
+            # processes that never finished, or that were resumed in another job
+            del _step_generators[next(iter(_step_generators))]
+        return self.OKStatus()
+
+    def _step_responses(self, step):
+        """The responses of a completed step of a generator OnRequest, as they are sent back into it."""
+        responses = [self._open_response(reference) for reference in step["r"]]
+        return responses if step["p"] else responses[0]
+
+    def _resume_steps(self, request, completion_key, call_response):
+        """Record a response of the current step of a generator OnRequest, and run it on once all of them are in."""
+        saved = self.iris_host_object.PythonStepState
+        if not saved:
+            # a response that arrived after the generator returned, or after a request of its step could not be sent
+            return self.OKStatus()
+        state = json.loads(saved)
+        state["current"][int(completion_key[len(_STEP_KEY):])] = self._response_reference(call_response)
+        state["pending"] -= 1
+        if state["pending"]:
+            self.iris_host_object.PythonStepState = json.dumps(state, separators=(",", ":"))
+            return self.OKStatus()
+
+        completed = state["steps"]
+        completed.append({"p": state["p"], "r": state["current"], "t": state["t"]})
+        steps, python_object, token = _step_generators.pop(state["key"], (None, None, None))
+        if token is not None and token == state["token"]:
+            # the generator is still alive in this job and left the state that was saved: only the responses of
+            # the last step are sent into it
+            python_object.iris_host_object = self.iris_host_object
+            if python_object is not self:
+                python_object.refresh_settings()
+            try:
+                return python_object._run_steps(steps, completed, state["key"], live=True)
+            finally:
+                python_object.iris_host_object = None
+        if steps is not None:
+            # the process went on in another job since this generator was kept
+            steps.close()
+        steps = type(self)._on_request(self, self._createmessage(message_object=request))
+        return self._run_steps(steps, completed, state["key"])
+
+    def SendRequestSync(self, target_dispatch_name, request, timeout=-1, description=""):
+        refs = self._refs
+        response = refs.pop() if refs else iris.ref()
+        try:
+            status = self.iris_host_object.SendRequestSync(target_dispatch_name,self.request_to_send(request),response,timeout,description)
+            response_value = response.value
+        finally:
+            response.value = None
+            refs.append(response)
 
         if response_value is not None:
             return status, self._createmessage(message_object=response_value)
@@ -485,59 +877,78 @@ class BusinessProcess(BaseClass):
         return self.SendRequestSync( target_dispatch_name, request, timeout, description)
 
 
+# prefix of the completion keys used by BusinessProcess.scatter, followed by the position of the request
+_GATHER_KEY = "pyprod.gather:"
+_GATHER_TIMEOUT_KEY = _GATHER_KEY + "timeout"
+# prefix of the completion keys of the requests yielded by a generator OnRequest, followed by their position
+_STEP_KEY = "pyprod.step:"
+# generators of generator OnRequest callbacks waiting for responses in this job, by the key saved in their
+# PythonStepState, with the python object running them, without its IRIS instance, and the token of the state
+# they saved. Oldest first, and at most _STEP_GENERATORS_MAX of them
+_step_generators: dict[str, tuple] = {}
+_STEP_GENERATORS_MAX = 1000
+
+
+def _step_targets(yielded):
+    """The targets of the calls yielded by a generator OnRequest, saved to check them when it is resumed."""
+    calls = yielded if isinstance(yielded, list) else [yielded]
+    return [call[0] if isinstance(call, tuple) and len(call) == 2 else None for call in calls]
+
+# python objects of business processes that set cache_python_instance, one per (module, class) in this job
+_BusinessProcess_instances: dict[tuple, BusinessProcess] = {}
+
+
+def _business_process_object(module_name: str, class_name: str, iris_host_object):
+    """
+    Called from the generated OnRequest/OnResponse stubs to get the python object for a business process.
+    """
+    key = (module_name, class_name)
+    python_object = _BusinessProcess_instances.get(key)
+    if python_object is not None:
+        python_object.iris_host_object = iris_host_object
+        if python_object.snapshot_settings:
+            python_object.refresh_settings()
+        return python_object
+
+    cls = getattr(importlib.import_module(module_name), class_name)
+    python_object = cls(iris_host_object)
+    if cls.cache_python_instance:
+        _BusinessProcess_instances[key] = python_object
+    return python_object
+
+
 class BusinessOperation(BaseClass):
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
         cls._hostname = "BusinessOperation"
+        cls._on_message = _resolve_callback(cls, "OnMessage", "on_message")
 
-    def OnMessageHelper(self, request, response):
-
-        python_request = self._createmessage(message_object=request)
-
-        if hasattr(self, "OnMessage"):
-            result = self.OnMessage(python_request)
-        elif hasattr(self, "on_message"):
-            result = self.on_message(python_request)
-        else:
+    def OnMessageHelper(self, request, response, packed=False):
+        on_message = type(self)._on_message
+        if on_message is None:
             raise NotImplementedError("Subclass must implement OnMessage or on_message")
+        return self._helper_result(on_message(self, self._createmessage(message_object=request)), packed)
 
-        if isinstance(result, (tuple, list)):
-            status, response = result
-            # return {"status":status, "response_available":0}
-            # return {"response":response,"status":status, "response_available":1}
-            return {
-                "response": self.request_to_send(response),
-                "status": status,
-                "response_available": 1,
-            }
-        else:
-            status = result
-            return {"status": status, "response_available": 0}
-
-    def AnyMethodHelper(self, request, method_name):
-        python_request = self._createmessage(message_object=request)
-        result = getattr(self, method_name)(python_request)
-        if isinstance(result, (tuple, list)):
-            status, response = result
-            return {"response": self.request_to_send(response),"status": status,"response_available": 1}
-        else:
-            status = result
-            return {"status": status, "response_available": 0}
+    def AnyMethodHelper(self, request, method_name, packed=False):
+        method = type(self)._methods.get(method_name) or self._method(method_name)
+        return self._helper_result(method(self, self._createmessage(message_object=request)), packed)
 
     def SendRequestSync(self, target_dispatch_name, request, timeout=-1, description=""):
-        response = iris.ref()
-        status = self.iris_host_object.SendRequestSync(
-            target_dispatch_name,
-            self.request_to_send(request),
-            response,
-            timeout,
-            description,
-        )
-
-        response_value = response.value
-        response.value = None
-        del response
+        refs = self._refs
+        response = refs.pop() if refs else iris.ref()
+        try:
+            status = self.iris_host_object.SendRequestSync(
+                target_dispatch_name,
+                self.request_to_send(request),
+                response,
+                timeout,
+                description,
+            )
+            response_value = response.value
+        finally:
+            response.value = None
+            refs.append(response)
 
         if response_value is not None:
             return status, self._createmessage(message_object=response_value)
@@ -554,38 +965,43 @@ class BusinessOperation(BaseClass):
     def send_request_async(self, target_dispatch_name, request, description=""):
         return self.SendRequestAsync(target_dispatch_name, request, description)
 
+    def send_many(self, target_or_targets, requests, description=""):
+        """
+        Send many requests asynchronously with one call into IRIS and return the status of each, in order.
+        Pass one target and a list of requests, a list of targets and one request, or two lists of equal length.
+        """
+        return self._send_many(target_or_targets, requests, description)
+
 
 class InboundAdapter(BaseClass):
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
         cls._hostname = "InboundAdapter"
-
+        cls._on_task = _resolve_callback(cls, "OnTask", "on_task")
 
     def OnTaskHelper(self):
-        if hasattr(self, "OnTask"):
-            return self.OnTask()
-        elif hasattr(self, "on_task"):
-            return self.on_task()
-        else:
+        on_task = type(self)._on_task
+        if on_task is None:
             raise NotImplementedError("Subclass must implement OnTask or on_task")
+        return on_task(self)
     
     def BusinessHost_ProcessInput(self, input, in_hint=""):
         
-        output = iris.ref()
+        refs = self._refs
+        output = refs.pop() if refs else iris.ref()
+        hint = refs.pop() if refs else iris.ref()
         output.value = ""
-        temp_hint = in_hint
-        hint = iris.ref()
-        hint.value = temp_hint
-        status = self.iris_host_object.BusinessHost.ProcessInput(input, output, hint)
-
-        output_value = output.value
-        output.value = None
-        del output
-
-        hint_value = hint.value
-        hint.value = None
-        del hint
+        hint.value = in_hint
+        try:
+            status = self.iris_host_object.BusinessHost.ProcessInput(input, output, hint)
+            output_value = output.value
+            hint_value = hint.value
+        finally:
+            output.value = None
+            hint.value = None
+            refs.append(output)
+            refs.append(hint)
 
         if in_hint != "":
             if (output_value is not None) and (output_value != ""):
@@ -604,18 +1020,22 @@ class OutboundAdapter(BaseClass):
         super().__init_subclass__(**kwargs)
         cls._hostname = "OutboundAdapter"
 
-    def AnyMethodHelper(self, arguments, method_name):
+    def AnyMethodHelper(self, arguments, method_name, packed=False):
 
         args, kwargs = arguments
-        
-        result = getattr(self, method_name)(*args, **kwargs)
+        method = type(self)._methods.get(method_name) or self._method(method_name)
+        result = method(self, *args, **kwargs)
 
         if isinstance(result, (tuple, list)):
             status = result[0]
             response = result[1:]
+            if packed:
+                return status, response
             return {"response": response,"status": status,"response_available": 1}
         else:
             status = result
+            if packed:
+                return status
             return {"status": status, "response_available": 0}
             
 
@@ -649,6 +1069,76 @@ def debug_host(ip: str, port: int = 5547) -> None:
 
 _ProductionMessage_registry: dict[str, type] = {}
 
+# IRIS class of incoming message objects -> function rebuilding the python message, None for IRIS objects that
+# are not python messages. Cleared whenever a message class is registered
+_message_loaders: dict[type, object] = {}
+
+
+def _message_loader(iris_class):
+    # this removes iris. which is in front of the incoming class name from iris backend
+    MsgCls = _ProductionMessage_registry.get(iris_class.__module__[5:] + "." + iris_class.__name__)
+    if MsgCls is None:
+        return None
+    if issubclass(MsgCls, PickleSerialize):
+        return lambda message_object: unpickle_binary(message_object, MsgCls)
+    return lambda message_object: MsgCls(iris_message_object=message_object)
+
+_NO_DEFAULT = object()
+
+# column datatypes whose IRIS property returns the same python value that was stored in it
+_LAZY_DIRECT_COLUMN_TYPES = ("str", "int")
+
+
+def _tracking_setattr(self, name, value):
+    # __setattr__ of message classes declared with track_changes=True
+    object.__setattr__(self, name, value)
+    changed = getattr(self, "_changed", None)
+    if changed is not None:
+        changed.add(name)
+
+
+def _compiled_init_fallback(self, base_init, given, iris_message_object, extra):
+    # rehydration, extra keyword arguments, or an instance of a subclass: use the generic constructor
+    kwargs = {name: value for name, value in given if value is not _NO_DEFAULT}
+    base_init(self, iris_message_object=iris_message_object, **kwargs, **extra)
+
+
+class _LazyField:
+    """
+    Installed on message classes declared with lazy=True, one per field. Rehydrated messages start without
+    any field set on the instance; the first read of a field decodes the payload into the instance, after
+    which reads never reach this descriptor again. str and int columns are read straight from their IRIS
+    property without decoding the payload.
+    """
+
+    __slots__ = ("name", "pascal_name", "direct", "default")
+
+    def __init__(self, name, direct, default):
+        self.name = name
+        self.pascal_name = snake_to_pascal(name)
+        self.direct = direct
+        self.default = default
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            if self.default is _NO_DEFAULT:
+                raise AttributeError(f"type object {owner.__name__!r} has no attribute {self.name!r}")
+            return self.default
+        if getattr(instance, "_lazy_pending", False):
+            values = instance.__dict__
+            if self.direct:
+                # "" is also what IRIS returns for None, so only a non empty value can be trusted
+                value = getattr(instance._iris_message_wrapper, self.pascal_name)
+                if value != "":
+                    values[self.name] = value
+                    return value
+            instance._materialize()
+            if self.name in values:
+                return values[self.name]
+        if self.default is _NO_DEFAULT:
+            raise AttributeError(f"{owner.__name__!r} object has no attribute {self.name!r}")
+        return self.default
+
 
 class ProductionMessage:
     """
@@ -670,11 +1160,94 @@ class ProductionMessage:
     """
 
 
-    __slots__ = ("_iris_message_wrapper")
+    __slots__ = ("_iris_message_wrapper", "_lazy_pending", "_changed")
 
-    def __init_subclass__(cls, **kwargs):
+    # payloads up to this many characters/bytes are stored inline in SerializedData instead of a stream.
+    # 0 disables inline storage. Set per class with: class MyMessage(JsonSerialize, inline_max=2048)
+    _inline_max = 0
+
+    # rehydrated messages decode their payload on first field access. Set per class with:
+    # class MyMessage(JsonSerialize, lazy=True)
+    _lazy = False
+
+    # messages that were not modified since they were rehydrated or last sent are not serialized again.
+    # Set per class with: class MyMessage(JsonSerialize, track_changes=True)
+    _track_changes = False
+
+    # binary payloads larger than _compress_above bytes are compressed with _compression. Set per class with:
+    # class MyMessage(PickleSerialize, compression="zlib", compression_level=6, compress_above=4096)
+    _compression = None
+    _compression_level = zlib.Z_DEFAULT_COMPRESSION
+    _compress_above = 4096
+
+    # payloads larger than _claim_check_above characters/bytes are written to a file in _claim_check_dir and
+    # the IRIS message only stores a reference to it. Set per class with:
+    # class MyMessage(PickleSerialize, claim_check_above=64 * 1024 * 1024, claim_check_dir="/data/claims")
+    _claim_check_above = None
+    _claim_check_dir = None
+
+    # payloads written to the claim-check store are keyed by their SHA-256 digest, so messages with the same
+    # payload share one file. dedup moves every payload larger than claim_check_above (DEDUP_ABOVE unless given)
+    # out of IRIS into the files, and smaller payloads stay in IRIS without being deduplicated. Set per class
+    # with: class MyMessage(JsonSerialize, dedup=True, claim_check_dir="/data/claims")
+    _dedup = False
+
+    # whether subclasses get a constructor generated by _compile_init
+    _compile_constructor = True
+
+    # whether the IRIS class has the SetColumns and GetColumns methods, which classes generated by older versions
+    # do not. Looked up in the class dictionary of IRIS once per class, see _has_bulk_columns
+    _bulk_columns = None
+
+    def __init_subclass__(cls, inline_max=None, lazy=None, track_changes=None, compression=None,
+                          compression_level=None, compress_above=None, claim_check_above=None,
+                          claim_check_dir=None, dedup=None, **kwargs):
+        # the class body as it was executed, before anything below sets class attributes
+        namespace = dict(cls.__dict__)
         super().__init_subclass__(**kwargs)
 
+        if inline_max is not None:
+            if not 0 <= inline_max <= BELOW_MAX_STRING:
+                raise ValueError(f"inline_max must be between 0 and {BELOW_MAX_STRING}")
+            cls._inline_max = inline_max
+        if lazy is not None:
+            cls._lazy = bool(lazy)
+        if track_changes is not None:
+            cls._track_changes = bool(track_changes)
+        if compression is not None:
+            if compression not in ("zlib", "none"):
+                raise ValueError(f"Unknown compression {compression!r}, expected 'zlib' or 'none'")
+            cls._compression = None if compression == "none" else compression
+        if compression_level is not None:
+            if not -1 <= compression_level <= 9:
+                raise ValueError("compression_level must be between -1 and 9")
+            cls._compression_level = compression_level
+        if compress_above is not None:
+            if compress_above < 0:
+                raise ValueError("compress_above cannot be negative")
+            cls._compress_above = compress_above
+        if claim_check_above is not None:
+            if claim_check_above < 0:
+                raise ValueError("claim_check_above cannot be negative")
+            cls._claim_check_above = claim_check_above
+        if claim_check_dir is not None:
+            cls._claim_check_dir = os.fspath(claim_check_dir)
+        if dedup is not None:
+            cls._dedup = bool(dedup)
+        if cls._dedup:
+            if cls._claim_check_dir is None:
+                raise TypeError(
+                    f"{cls.__name__}: dedup stores payloads in files outside IRIS, declare the class with "
+                    "claim_check_dir to choose where"
+                )
+            if cls._claim_check_above is None:
+                cls._claim_check_above = DEDUP_ABOVE
+        if cls._track_changes:
+            if "__setattr__" not in cls.__dict__:
+                cls.__setattr__ = _tracking_setattr
+        elif cls.__setattr__ is _tracking_setattr:
+            cls.__setattr__ = object.__setattr__
+
         # Look first for a class-level override:
         pkg = getattr(cls, "iris_package_name", None)
         if pkg is None:
@@ -689,10 +1262,16 @@ class ProductionMessage:
         # Cache it on the class object, in the class’s internal __dict__, for instant lookup later:
         cls._iris_package = pkg
         cls._fullname = cls._iris_package + "." + cls.__name__
-        cls._field_names, cls._column_field_names = cls._class_body_field_order_top_level()
+        cls._field_names, cls._column_field_names = cls._class_body_fields(namespace)
+        cls._column_property_names = ",".join(snake_to_pascal(name) for name in cls._column_field_names)
+        if cls._lazy:
+            cls._install_lazy_fields()
+        if "__init__" not in cls.__dict__ and cls._init_can_be_compiled():
+            cls.__init__ = cls._compile_init()
         # register every user subclass by its __name__. This is later used in Host classes for
         # generating objects dynamically at runtime based on incoming message type...
         _ProductionMessage_registry[cls._fullname] = cls
+        _message_loaders.clear()
 
     def __init__(self,*args,iris_message_object=None,json_str_or_dict=None,serializer="json",**kwargs,):
 
@@ -709,16 +1288,15 @@ class ProductionMessage:
 
         # 2) Build map of passed-in values
         values = {}
-        if iris_message_object is not None:
+        rehydrated = iris_message_object is not None
+        if rehydrated:
             # There is a case when the python type object is originating IRIS side. This happens when using testing
             # service from the productions UI. Here, the json_str_or_dict would be empty. 
             if json_str_or_dict == "":
-                for name in cls._column_field_names:
-                    if (val:=getattr(iris_message_object,snake_to_pascal(name))) != "":
-                        setattr(self, name, val)
+                for name, val in cls._read_columns(iris_message_object).items():
+                    setattr(self, name, val)
             else:
                 if serializer != "pickle":
-                    import json
                     # building using iris_message_object and json_str_or_dict. This is primarily to be used by IRIS side.
                     data = (json_str_or_dict if isinstance(json_str_or_dict, dict)
                         else json.loads(json_str_or_dict))
@@ -768,12 +1346,260 @@ class ProductionMessage:
 
         # 5) Link the Python object to the IRIS wrapper:
         object.__setattr__(self, "_iris_message_wrapper", iris_message_object)
+        if rehydrated:
+            # rehydrated, the IRIS message object already holds this exact content
+            self._mark_serialized()
+
+
+    @classmethod
+    def _init_can_be_compiled(cls):
+        if not cls._compile_constructor:
+            return False
+        if any(name.startswith("_pm_") or name == "iris_message_object" for name in cls._field_names):
+            return False
+        # every constructor that would run for a new message must be one that only forwards to this class
+        for base in cls.__mro__[1:-1]:
+            init = base.__dict__.get("__init__")
+            if init is not None and not getattr(init, "_pm_compiled", False) and base.__module__ != __name__:
+                return False
+        return True
+
+    @classmethod
+    def _compile_init(cls):
+        """
+        Generate an __init__ specialized for this class, equivalent to ProductionMessage.__init__ for new
+        messages: the positional/keyword mapping is done by the function signature, the defaults are
+        looked up once here, and the IRIS class is resolved on the first construction and kept.
+        Everything else (rehydration, extra keyword arguments, subclasses) goes through the generic path.
+        """
+        iris_class = [None]
+
+        def resolve():
+            iris_class[0] = getattr(getattr(iris, cls._iris_package), cls.__name__)
+            return iris_class[0]
+
+        namespace = {
+            "_pm_cls": cls,
+            "_pm_MISSING": _NO_DEFAULT,
+            "_pm_fallback": _compiled_init_fallback,
+            "_pm_base_init": super(cls, cls).__init__,
+            "_pm_object_setattr": object.__setattr__,
+            "_pm_iris_class": iris_class,
+            "_pm_resolve": resolve,
+        }
+        params, given, body = [], [], []
+        for index, name in enumerate(cls._field_names):
+            default = getattr(cls, name, None)
+            namespace[f"_pm_d{index}"] = default
+            default_expr = f"_pm_d{index}.get_default()" if isinstance(default, Column) else f"_pm_d{index}"
+            params.append(f"{name}=_pm_MISSING")
+            given.append(f"({name!r}, {name})")
+            body.append(f"    _pm_self.{name} = {default_expr} if {name} is _pm_MISSING else {name}")
+        source = "\n".join([
+            f"def __init__(_pm_self, {''.join(p + ', ' for p in params)}*, iris_message_object=None, **_pm_extra):",
+            "    if iris_message_object is not None or _pm_extra or type(_pm_self) is not _pm_cls:",
+            f"        return _pm_fallback(_pm_self, _pm_base_init, ({''.join(g + ', ' for g in given)}), "
+            "iris_message_object, _pm_extra)",
+            "    _pm_class = _pm_iris_class[0]",
+            "    if _pm_class is None:",
+            "        _pm_class = _pm_resolve()",
+            "    _pm_iris_message_object = _pm_class._New()",
+            *body,
+            "    _pm_object_setattr(_pm_self, '_iris_message_wrapper', _pm_iris_message_object)",
+        ])
+        exec(source, namespace)
+        init = namespace["__init__"]
+        init.__qualname__ = f"{cls.__qualname__}.__init__"
+        init.__module__ = cls.__module__
+        init._pm_compiled = True
+        return init
+
+    @classmethod
+    def _install_lazy_fields(cls):
+        annotations = cls.__dict__.get("__annotations__", {})
+        for name in cls._field_names:
+            default = cls.__dict__.get(name, _NO_DEFAULT)
+            direct = False
+            if name in cls._column_field_names:
+                datatype = getattr(default, "datatype", None) or annotations.get(name)
+                direct = getattr(datatype, "__name__", datatype) in _LAZY_DIRECT_COLUMN_TYPES
+            setattr(cls, name, _LazyField(name, direct, default))
+
+    def _rehydrate_lazily(self, iris_message_object):
+        object.__setattr__(self, "_iris_message_wrapper", iris_message_object)
+        object.__setattr__(self, "_lazy_pending", True)
+        self._mark_serialized()
+
+    def _changed_fields(self):
+        """
+        Names of the attributes set since the message was rehydrated or last serialized, or None when the
+        whole message has to be serialized (new message, or a class without track_changes).
+        """
+        if not type(self)._track_changes:
+            return None
+        return getattr(self, "_changed", None)
+
+    def _mark_serialized(self):
+        if type(self)._track_changes:
+            object.__setattr__(self, "_changed", set())
+
+    def mark_changed(self, *names):
+        """
+        Record changes that assignment cannot see, such as appending to a list field, on a message class
+        declared with track_changes=True. Without names, the whole message is serialized when it is next sent.
+        """
+        changed = getattr(self, "_changed", None)
+        if names and changed is not None:
+            changed.update(names)
+        else:
+            object.__setattr__(self, "_changed", None)
 
+    def _materialize(self):
+        """
+        Decode the payload of a lazily rehydrated message into the instance. Fields that were already read
+        from a column or assigned since rehydration keep their current value.
+        """
+        if not getattr(self, "_lazy_pending", False):
+            return
+        data = self._load_payload()
+        if data is None:
+            # no payload, the message was created on the IRIS side (e.g. testing service); use the columns
+            data = self._read_columns(self._iris_message_wrapper)
+        values = self.__dict__
+        for name, value in data.items():
+            if name not in values:
+                values[name] = value
+        object.__setattr__(self, "_lazy_pending", False)
+
+    def _load_payload(self):
+        """
+        Return the decoded payload of the IRIS message object as a dict, or None if there is none. Serializers
+        that write a payload override this; messages without one are rebuilt from their columns alone.
+        """
+        return None
+
+    @classmethod
+    def _payload_writer(cls, binary=False):
+        writer = _IRISStreamWriter(binary=binary, inline_max=cls._inline_max)
+        if cls._claim_check_above is not None:
+            return _ClaimCheckWriter(writer, binary, cls._claim_check_above, _claim_check_store(cls._claim_check_dir),
+                                     cls._compressing_writer, cls._dedup)
+        return cls._compressing_writer(writer, binary)
+
+    @classmethod
+    def _compressing_writer(cls, writer, binary):
+        # character streams are shown as text by the message viewer, so they are never compressed
+        if cls._compression is None or not binary:
+            return writer
+        return _CompressingWriter(writer, cls._compression_level, cls._compress_above)
+
+    @classmethod
+    def _has_bulk_columns(cls):
+        # looked up per class, as a subclass generated again may have the methods when its parent does not
+        bulk_columns = cls.__dict__.get("_bulk_columns")
+        if bulk_columns is None:
+            bulk_columns = bool(iris.cls("%Dictionary.CompiledMethod")._ExistsId(cls._fullname + "||GetColumns"))
+            cls._bulk_columns = bulk_columns
+        return bulk_columns
+
+    @classmethod
+    def _read_columns(cls, iris_message_object, names=None):
+        """
+        Return the non-empty columns of the IRIS message object as {field name: value}, read with one call to
+        GetColumns instead of one property access per column.
+        """
+        if names is None:
+            names = cls._column_field_names
+        if not names:
+            return {}
+        if cls._has_bulk_columns():
+            property_names = (cls._column_property_names if names is cls._column_field_names
+                              else ",".join(snake_to_pascal(name) for name in names))
+            values = json.loads(iris_message_object.GetColumns(property_names))
+            return {name: value for name, value in zip(names, values) if value != ""}
+        return {name: value for name in names
+                if (value := getattr(iris_message_object, snake_to_pascal(name))) != ""}
+
+    def _write_columns(self, message_object, names):
+        """Store the given columns on the IRIS message object, with one call to SetColumns for more than one."""
+        cls = type(self)
+        if len(names) > 1 and cls._has_bulk_columns():
+            property_names = (cls._column_property_names if names == cls._column_field_names
+                              else ",".join(snake_to_pascal(name) for name in names))
+            message_object.SetColumns(property_names, *[getattr(self, name) for name in names])
+            return
+        for name in names:
+            setattr(message_object, snake_to_pascal(name), getattr(self, name))
 
     @staticmethod
     def _is_column_call(value: ast.AST) -> bool:
         return isinstance(value, ast.Call) and isinstance(value.func, ast.Name) and value.func.id == "Column"
 
+    @classmethod
+    def _class_body_fields(cls, namespace):
+        """
+        Return the field names and the Column field names of the class, in the order they appear in the class
+        body, from its namespace and annotations.
+
+        Names that are only annotated ("name: T") are not in the namespace, and annotations do not record
+        where they were made relative to unannotated assignments ("name = v"). When a class has both, the
+        order is read from its source with _class_body_field_order_top_level. Without source (.pyc only or
+        zip deployments) each annotation-only name is placed before the next annotated assignment.
+        """
+        annotations = namespace.get("__annotations__", {})
+        assigned = [name for name, value in namespace.items() if cls._is_body_field(name, value)]
+        annotation_only = [name for name in annotations if name not in namespace]
+        if annotation_only and any(name not in annotations for name in assigned):
+            try:
+                return cls._class_body_field_order_top_level()
+            except (OSError, TypeError):
+                pass
+
+        position = {name: index for index, name in enumerate(annotations)}
+        names, next_pending = [], 0
+        for name in assigned:
+            if name in position:
+                # annotation-only names made before this one
+                while next_pending < len(annotation_only) and position[annotation_only[next_pending]] < position[name]:
+                    names.append(annotation_only[next_pending])
+                    next_pending += 1
+            names.append(name)
+        names.extend(annotation_only[next_pending:])
+        columns = [name for name in names if isinstance(namespace.get(name), Column)]
+        return names, columns
+
+    @staticmethod
+    def _is_body_field(name, value):
+        """
+        Whether a class namespace entry is a field: assigned in the class body, not a def or nested class.
+        Decorated defs count as defs, whatever the decorator returns: the function is found through the
+        wrapper (classmethod, property, functools.lru_cache, cached_property, partialmethod, ...), and other
+        non-data descriptors are taken to be methods.
+        """
+        if name.startswith("__") and name.endswith("__"):
+            return False
+        if isinstance(value, types.ModuleType):
+            return False
+        if isinstance(value, Column):
+            return True
+        wrapper = value
+        while not isinstance(value, (types.FunctionType, type)):
+            if isinstance(value, (classmethod, staticmethod)):
+                value = value.__func__
+            elif isinstance(value, property):
+                value = value.fget
+            elif isinstance(value, (functools.cached_property, functools.partialmethod)):
+                value = value.func
+            elif hasattr(value, "__wrapped__"):
+                value = value.__wrapped__
+            else:
+                break
+        if isinstance(value, (types.FunctionType, type)):
+            # defined in the body with def or class, unlike e.g. an assigned lambda or builtin type
+            return not value.__qualname__.endswith("." + name)
+        kind = type(wrapper)
+        return not (hasattr(kind, "__get__") and not hasattr(kind, "__set__") and not hasattr(kind, "__delete__"))
+
     @classmethod
     def _class_body_field_order_top_level(cls):
         """Return names in the exact order they appear in the top-level class body.
@@ -828,96 +1654,907 @@ class ProductionMessage:
         pass
         # raise NotImplementedError("must write this method for each subclass to define serialization tactics")
 
+class _IRISStreamWriter:
+    """
+    File-like sink for the serialized payload of a message. Writes go into a new IRIS stream in pieces of
+    at most chunk_size characters (or bytes); small writes are buffered until a full piece is available, so
+    the payload never has to be held in memory as one python object.
+
+    With inline_max, the stream is only created once the payload grows past inline_max. Smaller payloads
+    are stored in the SerializedData property by close().
+    """
+
+    def __init__(self, binary=False, chunk_size=BELOW_MAX_STRING, inline_max=0):
+        self._iris_stream = None
+        self._binary = binary
+        self._chunk_size = chunk_size
+        self._inline_max = inline_max
+        self._pending = []
+        self._pending_size = 0
+
+    def write(self, data):
+        size = len(data)
+        if size >= self._chunk_size:
+            # large pieces skip the buffer. Binary ones are sliced through a memoryview, so each chunk is copied
+            # once, into the bytes handed to IRIS
+            self.flush()
+            self._write_chunks(memoryview(data).cast("B") if self._binary else data, keep_tail=True)
+        else:
+            self._pending.append(data)
+            self._pending_size += size
+            if self._pending_size >= self._chunk_size:
+                self._write_chunks(self._take_pending(), keep_tail=True)
+        return size
+
+    def flush(self):
+        if self._pending:
+            self._write_chunks(self._take_pending(), keep_tail=False)
+
+    def _take_pending(self):
+        pending = (b"" if self._binary else "").join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        return pending
+
+    def _write_chunks(self, data, keep_tail):
+        chunk_size = self._chunk_size
+        start, end = 0, len(data)
+        while end - start >= chunk_size or (not keep_tail and start < end):
+            self._write_to_iris(data[start:start + chunk_size])
+            start += chunk_size
+        # only the tail that did not fill a whole piece stays in memory, copied out of the caller's buffer
+        if start < end:
+            tail = data[start:]
+            self._pending.append(tail.tobytes() if isinstance(tail, memoryview) else tail)
+            self._pending_size = end - start
+
+    def _write_to_iris(self, chunk):
+        if self._iris_stream is None:
+            stream_class = iris._Stream.GlobalBinary if self._binary else iris._Stream.GlobalCharacter
+            self._iris_stream = stream_class._New()
+        if self._binary:
+            chunk = iris._SYS.Python.Bytes(bytes(chunk))
+        self._iris_stream.Write(chunk)
+
+    def close(self, iris_message_object):
+        """Store everything written so far on the IRIS message object."""
+        if self._inline_max and self._iris_stream is None and self._pending_size <= self._inline_max:
+            data = self._take_pending()
+            if self._binary:
+                data = iris._SYS.Python.Bytes(bytes(data))
+            iris_message_object.SerializedData = data
+            iris_message_object.SerializedStream = ""
+            return
+
+        self.flush()
+        if self._iris_stream is None:
+            # nothing was written, still replace any previous payload
+            self._write_to_iris(b"" if self._binary else "")
+        iris_message_object.SerializedStream = self._iris_stream
+        if self._inline_max:
+            iris_message_object.SerializedData = ""
+
+
+class _SerializedStreamReader:
+    """
+    Read-only file-like view over the SerializedStream of an IRIS message object. Chunks are pulled
+    through chunksFromIRIS only when they are needed, so pickle.load can consume the stream directly
+    without the whole payload being joined in memory first.
+
+    Reads return str for JsonSerialize messages (character stream) and bytes for PickleSerialize
+    messages (binary stream). JsonSerialize still reads its payload whole, as the json module cannot decode a
+    document in pieces.
+    """
+
+    def __init__(self, iris_message_object, chunk_size=BELOW_MAX_STRING):
+        self._iris_message_object = iris_message_object
+        self._chunk_size = chunk_size
+        self._iteration = 0
+        self._chunk = None
+        self._offset = 0
+        self._exhausted = False
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        """Make sure unread data is available in the current chunk. Returns False at the end of the stream."""
+        if self._chunk is not None and self._offset < len(self._chunk):
+            return True
+        if self._exhausted:
+            return False
+        part = self._iris_message_object.chunksFromIRIS(self._iteration, self._chunk_size)
+        self._iteration += 1
+        if not part:
+            self._exhausted = True
+            if self._chunk is None:
+                self._chunk = part
+            return False
+        self._chunk, self._offset = part, 0
+        return True
+
+    def at_end(self):
+        return not self._fill()
+
+    def peek(self, size=1):
+        """Return up to size characters (or bytes) of the current chunk without consuming them."""
+        if not self._fill():
+            return self._empty()
+        return self._chunk[self._offset:self._offset + size]
+
+    def _empty(self):
+        return self._chunk[:0] if self._chunk is not None else b""
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self.readall()
+        pieces = []
+        while size > 0 and self._fill():
+            piece = self._chunk[self._offset:self._offset + size]
+            self._offset += len(piece)
+            size -= len(piece)
+            pieces.append(piece)
+        if len(pieces) == 1:
+            return pieces[0]
+        return self._empty().join(pieces)
+
+    def readall(self):
+        pieces = []
+        while self._fill():
+            pieces.append(self._chunk[self._offset:] if self._offset else self._chunk)
+            self._offset = len(self._chunk)
+        if len(pieces) == 1:
+            return pieces[0]
+        return self._empty().join(pieces)
+
+    def readinto(self, buffer):
+        """Fill a caller-provided (preallocated) buffer. Only valid for binary streams."""
+        view = memoryview(buffer).cast("B")
+        filled = 0
+        while filled < len(view) and self._fill():
+            piece = self._chunk[self._offset:self._offset + len(view) - filled]
+            view[filled:filled + len(piece)] = piece
+            filled += len(piece)
+            self._offset += len(piece)
+        return filled
+
+    def readline(self, size=-1):
+        remaining = size if size is not None and size >= 0 else None
+        pieces = []
+        while (remaining is None or remaining > 0) and self._fill():
+            newline = "\n" if isinstance(self._chunk, str) else b"\n"
+            end = self._chunk.find(newline, self._offset)
+            end = len(self._chunk) if end < 0 else end + 1
+            if remaining is not None:
+                end = min(end, self._offset + remaining)
+                remaining -= end - self._offset
+            piece = self._chunk[self._offset:end]
+            self._offset = end
+            pieces.append(piece)
+            if piece.endswith(newline):
+                break
+        return self._empty().join(pieces)
+
+
+class _CompressingWriter:
+    """
+    Sits in front of a binary _IRISStreamWriter or claim-check file and zlib compresses the payload once more
+    than threshold bytes have been written; smaller payloads are written unchanged. Compressed payloads start
+    with _ZLIB_ENVELOPE.
+    """
+
+    def __init__(self, writer, level, threshold):
+        self._writer = writer
+        self._level = level
+        self._threshold = threshold
+        self._compressor = None
+        self._pending = []
+        self._pending_size = 0
+
+    def write(self, data):
+        size = len(data)
+        if self._compressor is not None:
+            self._compress(data)
+            return size
+        self._pending.append(data)
+        self._pending_size += size
+        if self._pending_size > self._threshold:
+            self._compressor = zlib.compressobj(self._level)
+            self._writer.write(_ZLIB_ENVELOPE)
+            pending, self._pending = self._pending, []
+            for piece in pending:
+                self._compress(piece)
+        return size
+
+    def _compress(self, data):
+        compressed = self._compressor.compress(data)
+        if compressed:
+            self._writer.write(compressed)
+
+    def close(self, iris_message_object):
+        if self._compressor is None:
+            for piece in self._pending:
+                self._writer.write(piece)
+            self._pending = []
+        else:
+            self._writer.write(self._compressor.flush())
+        self._writer.close(iris_message_object)
+
+
+class _DecompressingReader(io.RawIOBase):
+    """Raw binary reader returning the decompressed content of a zlib compressed payload."""
+
+    def __init__(self, reader, chunk_size=BELOW_MAX_STRING):
+        self._reader = reader
+        self._chunk_size = chunk_size
+        self._decompressor = zlib.decompressobj()
+
+    def readable(self):
+        return True
+
+    def _read_compressed(self):
+        return self._reader.read(self._chunk_size)
+
+    def readinto(self, buffer):
+        size = len(buffer)
+        while True:
+            data = self._decompressor.unconsumed_tail
+            if not data and not self._decompressor.eof:
+                data = self._read_compressed()
+            if not data:
+                return 0
+            decompressed = self._decompressor.decompress(data, size)
+            if decompressed:
+                buffer[:len(decompressed)] = decompressed
+                return len(decompressed)
+
+    def readall(self):
+        pieces = []
+        data = self._decompressor.unconsumed_tail
+        while True:
+            if data:
+                pieces.append(self._decompressor.decompress(data))
+            if self._decompressor.eof:
+                break
+            data = self._read_compressed()
+            if not data:
+                break
+        return b"".join(pieces)
+
+
+class _ClaimCheckStore:
+    """
+    Files holding the payloads of messages declared with claim_check_above. Each payload is written once
+    to objects/<key>, and every message pointing to it holds a reference: a hard link refs/<key>.<id> whose
+    path is stored in the IRIS message. The number of references is the link count of the object, kept by
+    the file system across processes. Releasing the last reference deletes the object.
+
+    The key is random, or the SHA-256 digest of the content for classes declared with dedup=True, in which
+    case a payload that is already stored is not stored again.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self._objects = os.path.join(self.directory, "objects")
+        self._refs = os.path.join(self.directory, "refs")
+        self._created = False
+
+    def new_file(self):
+        """Open a temporary file for a new payload; pass its name to commit once it is written."""
+        if not self._created:
+            os.makedirs(self._objects, exist_ok=True)
+            os.makedirs(self._refs, exist_ok=True)
+            self._created = True
+        return tempfile.NamedTemporaryFile(dir=self._objects, prefix=".new-", delete=False)
+
+    def commit(self, temp_name, digest=None):
+        """
+        Move a written temporary file into the store and return a reference to it. With the digest of its
+        content, an object with the same digest is reused and the temporary file is deleted.
+        """
+        if digest is None:
+            key = uuid.uuid4().hex
+            os.replace(temp_name, os.path.join(self._objects, key))
+            return self.retain(key)
+        while True:
+            try:
+                # unlike a rename, fails if the object exists
+                os.link(temp_name, os.path.join(self._objects, digest))
+            except FileExistsError:
+                try:
+                    reference = self.retain(digest)
+                except FileNotFoundError:
+                    # its last reference was released in the meantime, store it again
+                    continue
+            else:
+                reference = self.retain(digest)
+            os.unlink(temp_name)
+            return reference
+
+    def retain(self, key):
+        """Add a reference to the object key and return it."""
+        reference = os.path.join(self._refs, f"{key}.{uuid.uuid4().hex}")
+        os.link(os.path.join(self._objects, key), reference)
+        return reference
+
+    @staticmethod
+    def references(reference):
+        """Number of references to the object a reference points to."""
+        return os.stat(reference).st_nlink - 1
+
+    @staticmethod
+    def release(reference):
+        """Drop a reference, deleting the object once no reference to it is left."""
+        refs, name = os.path.split(reference)
+        path = os.path.join(os.path.dirname(refs), "objects", name.partition(".")[0])
+        try:
+            os.unlink(reference)
+        except FileNotFoundError:
+            pass
+        try:
+            if os.stat(path).st_nlink <= 1:
+                os.unlink(path)
+        except FileNotFoundError:
+            # released at the same time by another process
+            pass
+
+
+_claim_check_stores: dict[str, _ClaimCheckStore] = {}
+
+
+def _claim_check_store(directory):
+    if directory is None:
+        directory = _default_claim_check_dir
+    if directory is None:
+        raise RuntimeError(
+            "No claim-check directory: declare the message class with claim_check_dir or call "
+            "set_claim_check_directory, with a directory on a persistent disk every job can read"
+        )
+    store = _claim_check_stores.get(directory)
+    if store is None:
+        store = _claim_check_stores[directory] = _ClaimCheckStore(directory)
+    return store
+
+
+# None until set_claim_check_directory is called: the payloads are only kept in the files, so they are never
+# written to a default location such as the temporary directory, which is cleaned on reboot
+_default_claim_check_dir = None
+
+
+def set_claim_check_directory(path) -> None:
+    """
+    Select the directory where this process writes the payloads of message classes declared with
+    claim_check_above and without their own claim_check_dir. Every job reading the messages must be able
+    to open the files, so use a directory on a disk they share.
+    """
+    global _default_claim_check_dir
+    _default_claim_check_dir = os.fspath(path)
+
+
+class _ClaimCheckFile:
+    """
+    Binary sink for a payload spilled to the claim-check store. On close, the file is committed to the
+    store and only its reference is written to the IRIS writer.
+    """
+
+    def __init__(self, writer, binary, store, dedup=False):
+        self._writer = writer
+        self._binary = binary
+        self._store = store
+        self._file = store.new_file()
+        self._hash = hashlib.sha256() if dedup else None
+        self.reference = None
+
+    def write(self, data):
+        if self._hash is not None:
+            self._hash.update(data)
+        return self._file.write(data)
+
+    def close(self, iris_message_object):
+        self._file.close()
+        digest = self._hash.hexdigest() if self._hash is not None else None
+        self.reference = self._store.commit(self._file.name, digest)
+        header = _CLAIM_CHECK_ENVELOPE + self.reference.encode("utf-8")
+        self._writer.write(header if self._binary else header.decode("utf-8"))
+        self._writer.close(iris_message_object)
+
+
+class _ClaimCheckWriter:
+    """
+    Sits in front of an _IRISStreamWriter. Payloads of at most threshold characters (or bytes) go to IRIS
+    as usual; bigger ones are written to a file of the claim-check store instead. compressing_writer(writer,
+    binary) adds the compression of the message class, to IRIS or to the file. The reference previously
+    held by the IRIS message object is released once the new payload is stored.
+    """
+
+    def __init__(self, writer, binary, threshold, store, compressing_writer, dedup=False):
+        self._writer = writer
+        self._dedup = dedup
+        self._binary = binary
+        self._threshold = threshold
+        self._store = store
+        self._compressing_writer = compressing_writer
+        self._target = None
+        self._file = None
+        self._pending = []
+        self._pending_size = 0
+
+    def write(self, data):
+        size = len(data)
+        if self._target is not None:
+            self._target.write(data)
+            return size
+        self._pending.append(data)
+        self._pending_size += size
+        if self._pending_size > self._threshold:
+            self._file = _ClaimCheckFile(self._writer, self._binary, self._store, self._dedup)
+            # compressed in binary, so character payloads are encoded before being compressed
+            self._target = self._compressing_writer(self._file, True)
+            if not self._binary:
+                self._target = _Utf8Writer(self._target)
+            self._flush_pending()
+        return size
+
+    def _flush_pending(self):
+        pending, self._pending = self._pending, []
+        for piece in pending:
+            self._target.write(piece)
+
+    def close(self, iris_message_object):
+        previous = _claim_check_reference(iris_message_object)
+        if self._target is None:
+            self._target = self._compressing_writer(self._writer, self._binary)
+            self._flush_pending()
+        self._target.close(iris_message_object)
+        if previous is not None:
+            _ClaimCheckStore.release(previous)
+
+
+class _Utf8Writer:
+    """Encodes character payloads spilled to the claim-check store, which stores them as UTF-8."""
+
+    def __init__(self, writer):
+        self._writer = writer
+
+    def write(self, data):
+        return self._writer.write(data.encode("utf-8"))
+
+    def close(self, iris_message_object):
+        self._writer.close(iris_message_object)
+
+
+class _MappedPayload(mmap.mmap):
+    """Read-only memory map of a claim-check file, with the file-like methods pickle and _open_payload use."""
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return io.BytesIO()
+            return cls(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def readable(self):
+        return True
+
+    def peek(self, size=1):
+        position = self.tell()
+        return self[position:position + max(size, 1)]
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast("B")
+        position = self.tell()
+        size = min(len(view), len(self) - position)
+        view[:size] = memoryview(self)[position:position + size]
+        self.seek(position + size)
+        return size
+
+
+def _claim_check_reference(iris_message_object):
+    """Return the claim-check reference stored in the IRIS message object, or None."""
+    reader = _SerializedStreamReader(iris_message_object, chunk_size=1024)
+    header = reader.read(len(_CLAIM_CHECK_ENVELOPE))
+    if header not in (_CLAIM_CHECK_ENVELOPE, _CLAIM_CHECK_ENVELOPE.decode("latin-1")):
+        return None
+    reference = reader.read()
+    return reference if isinstance(reference, str) else reference.decode("utf-8")
+
+
+def _release_claim_check(iris_message_object) -> None:
+    """Called by %OnDelete of message classes declared with claim_check_above or dedup, e.g. by the message purge."""
+    reference = _claim_check_reference(iris_message_object)
+    if reference is not None:
+        _ClaimCheckStore.release(reference)
+
+
+def _open_payload(reader):
+    """
+    Return a file-like object over the message payload read by a _SerializedStreamReader. Payloads that
+    start with an envelope header are unwrapped; plain payloads are read from the reader itself.
+    """
+    if reader.peek(1)[:1] not in ("\x00", b"\x00"):
+        return reader
+    header = reader.read(len(_ZLIB_ENVELOPE))
+    binary = isinstance(header, bytes)
+    if not binary:
+        header = header.encode("latin-1")
+    if header == _ZLIB_ENVELOPE and binary:
+        # the compressed content can itself be an envelope, e.g. an out-of-band pickle
+        return _open_payload(io.BufferedReader(_DecompressingReader(reader)))
+    if header == _OUT_OF_BAND_ENVELOPE:
+        return _OutOfBandPickle.read_from(reader)
+    if header == _CLAIM_CHECK_ENVELOPE:
+        reference = reader.read()
+        payload = _open_payload(_MappedPayload.open(reference.decode("utf-8") if binary else reference))
+        return payload if binary else io.StringIO(payload.read().decode("utf-8"))
+    raise ValueError(f"Unknown payload header {header!r}")
+
+
+def _is_long_json_value(value):
+    if isinstance(value, str):
+        return len(value) > JSON_ENCODE_STRING
+    return isinstance(value, (list, tuple, dict)) and len(value) > JSON_ENCODE_BATCH
+
+
+def _iterencode_json(data: dict, encoder: json.JSONEncoder):
+    """
+    Yield the JSON document for a dict of message fields piece by piece. The output is identical to
+    json.dumps(data).
+
+    json.JSONEncoder.iterencode falls back to the pure python encoder, so instead the C encoder is used on
+    runs of values. Long strings are encoded JSON_ENCODE_STRING characters at a time, and long lists/dicts
+    JSON_ENCODE_BATCH items at a time, at any depth they are reached by. Documents without any of them are
+    encoded in a single call.
+
+    Only values that are themselves long are split: a list of JSON_ENCODE_BATCH short lists that each hold
+    long strings is still encoded one batch at a time, so its pieces can be larger than one IRIS chunk.
+    """
+    encode = encoder.encode
+    if not any(_is_long_json_value(value) for value in data.values()):
+        yield encode(data)
+        return
+    yield from _iterencode_json_value(data, encode)
+
+
+def _iterencode_json_value(value, encode):
+    if isinstance(value, str):
+        if len(value) <= JSON_ENCODE_STRING:
+            yield encode(value)
+            return
+        yield '"'
+        for start in range(0, len(value), JSON_ENCODE_STRING):
+            # slicing a str never splits a character, so the escaped slices join into the escaped string
+            yield encode(value[start:start + JSON_ENCODE_STRING])[1:-1]
+        yield '"'
+        return
+    if isinstance(value, dict):
+        opening, closing, items = "{", "}", value.items()
+    elif isinstance(value, (list, tuple)):
+        opening, closing, items = "[", "]", value
+    else:
+        yield encode(value)
+        return
+
+    is_dict = opening == "{"
+    yield opening
+    separator = ""
+    run = []
+    for item in items:
+        item_value = item[1] if is_dict else item
+        if not _is_long_json_value(item_value):
+            run.append(item)
+            if len(run) < JSON_ENCODE_BATCH:
+                continue
+        if run:
+            yield separator
+            # strip the surrounding braces (or brackets) of the encoded run of items
+            yield encode(dict(run) if is_dict else run)[1:-1]
+            separator = ", "
+            if run[-1] is item:
+                run = []
+                continue
+            run = []
+        yield separator
+        if is_dict:
+            # dict keys are converted to JSON strings the way json.dumps converts them
+            yield encode({item[0]: 0})[1:-4]
+            yield ": "
+        yield from _iterencode_json_value(item_value, encode)
+        separator = ", "
+    if run:
+        yield separator
+        yield encode(dict(run) if is_dict else run)[1:-1]
+    yield closing
+
+
+_json_encoder = json.JSONEncoder()
+
+
+class _JsonCodec:
+    """
+    A JSON encoder/decoder pair used by JsonSerialize. dumps may return str or UTF-8 bytes, loads must
+    accept str. Messages that dumps rejects (e.g. integers that do not fit in 64 bits) are encoded with
+    the stdlib json module instead, so switching codecs never makes a message unsendable.
+    """
+
+    def __init__(self, name, dumps, loads):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+    def iterencode(self, data):
+        try:
+            encoded = self.dumps(data)
+        except (TypeError, ValueError):
+            yield from _iterencode_json(data, _json_encoder)
+            return
+        if not isinstance(encoded, str):
+            encoded = bytes(encoded).decode("utf-8")
+        yield encoded
+
+
+class _StdlibJsonCodec(_JsonCodec):
+    """The default codec. The only one that streams the document into IRIS while encoding it."""
+
+    def __init__(self):
+        super().__init__("json", json.dumps, json.loads)
+
+    def iterencode(self, data):
+        return _iterencode_json(data, _json_encoder)
+
+
+def _orjson_codec():
+    import orjson
+
+    option = orjson.OPT_NON_STR_KEYS
+    return _JsonCodec("orjson", lambda data: orjson.dumps(data, option=option), orjson.loads)
+
+
+def _msgspec_codec():
+    import msgspec
+
+    return _JsonCodec("msgspec", msgspec.json.encode, msgspec.json.decode)
+
+
+# codecs that are built on first use. Optional libraries are only imported when their codec is selected
+_json_codec_factories = {"json": _StdlibJsonCodec, "orjson": _orjson_codec, "msgspec": _msgspec_codec}
+_json_codecs: dict[str, _JsonCodec] = {}
+_default_json_codec = "json"
+
+
+def register_json_codec(name: str, dumps, loads) -> None:
+    """
+    Register a JSON codec under a name that can then be passed to set_json_codec or used as
+    class MyMessage(JsonSerialize, json_codec=name).
+
+    dumps(obj) must return str or UTF-8 bytes, loads(str) must return the decoded object.
+    """
+    _json_codecs[name] = _JsonCodec(name, dumps, loads)
+
+
+def set_json_codec(name: str) -> None:
+    """
+    Select the JSON codec used in this process by every JsonSerialize class that does not pick its own
+    with the json_codec class keyword. Built-in names are "json" (default), "orjson" and "msgspec".
+    """
+    global _default_json_codec
+    if name not in _json_codecs and name not in _json_codec_factories:
+        raise LookupError(f"No JSON codec named {name!r} registered")
+    _default_json_codec = name
+
+
+def _get_json_codec(name: str) -> _JsonCodec:
+    codec = _json_codecs.get(name)
+    if codec is None:
+        if name not in _json_codec_factories:
+            raise LookupError(f"No JSON codec named {name!r} registered")
+        try:
+            codec = _json_codec_factories[name]()
+        except ImportError:
+            IRISLog.Warning(f"JSON codec {name!r} is not installed, falling back to the json module")
+            codec = _get_json_codec("json")
+        _json_codecs[name] = codec
+    return codec
+
+
 class JsonSerialize(ProductionMessage):
-    __slots__ = ("_serial_stream",)
+    __slots__ = ()
 
-    def __init_subclass__(cls, **kwargs):
+    # name of the JSON codec for this class, None uses the process wide codec (see set_json_codec)
+    _json_codec_name = None
+
+    def __init_subclass__(cls, json_codec=None, **kwargs):
         super().__init_subclass__(**kwargs)
         cls._serializer_class = "JsonSerialize"
+        if json_codec is not None:
+            cls._json_codec_name = json_codec
+        if cls._compression is not None and cls._claim_check_above is None:
+            raise TypeError(
+                f"{cls.__name__}: JsonSerialize payloads are stored as JSON text and are not compressed in IRIS; "
+                "compression only applies to the payloads written to the claim-check store (claim_check_above)"
+            )
+
+    @classmethod
+    def _json_codec(cls):
+        return _get_json_codec(cls._json_codec_name or _default_json_codec)
     
     def __init__(self,*args,iris_message_object=None,json_str_or_dict=None,serializer="json",**kwargs,):
         if (iris_message_object is not None) and (json_str_or_dict is None):
-            chunk_size = BELOW_MAX_STRING
-
-            iteration = 0
-            chunks = []
-            while True:
-                part = iris_message_object.chunksFromIRIS(iteration, chunk_size)
-                if not part:
-                    break
-                chunks.append(part)
-                iteration += 1
-            json_str = "".join(chunks)
-
-            json_str_or_dict = json_str
+            if type(self)._lazy and not (args or kwargs):
+                self._rehydrate_lazily(iris_message_object)
+                return
+            json_str_or_dict = _open_payload(_SerializedStreamReader(iris_message_object)).read()
+        if isinstance(json_str_or_dict, str) and json_str_or_dict:
+            json_str_or_dict = self._json_codec().loads(json_str_or_dict)
         super().__init__(*args,iris_message_object=iris_message_object,json_str_or_dict=json_str_or_dict,
             serializer=serializer,**kwargs,)
 
-    def chunks_from_python(self, iteration, start, end):
+    @property
+    def iris_message_object(self):
+        return object.__getattribute__(self, "_iris_message_wrapper")
+
+    def _load_payload(self):
+        json_str = _open_payload(_SerializedStreamReader(self._iris_message_wrapper)).read()
+        if not json_str:
+            return None
+        data = self._json_codec().loads(json_str)
+        return {name: data[name] for name in self._field_names if name in data}
 
+    def update_iris_message_object(self):
         """
-        Return a slice of the serialized JSON payload for this message.
+        Serialize the message into a new SerializedStream (or SerializedData, see inline_max), streaming the
+        JSON text into IRIS as it is encoded.
 
         Field-name based: we serialize only declared message fields (cls._field_names),
         not self.__dict__, so internal attributes and accidental extras are excluded.
+
+        With track_changes, an unchanged message keeps its current payload, and only the columns of changed
+        fields are written.
         """
-        if iteration == 0:
-            import json
+        changed = self._changed_fields()
+        if changed is not None and not changed:
+            return
+        self._materialize()
+        cls = type(self)
+        writer = cls._payload_writer()
+        data = {name: getattr(self, name) for name in cls._field_names}
+        for piece in cls._json_codec().iterencode(data):
+            writer.write(piece)
+        writer.close(self._iris_message_wrapper)
+        self.create_iris_message_object_properties(self._iris_message_wrapper, changed)
+        self._mark_serialized()
 
-            cls = type(self)
-            data = {name: getattr(self, name) for name in cls._field_names}
-            object.__setattr__(self, "_serial_stream", json.dumps(data))
+    def create_iris_message_object_properties(self, message_object, changed=None):
+        names = self._column_field_names
+        self._write_columns(message_object, names if changed is None else [name for name in names if name in changed])
 
-        return object.__getattribute__(self, "_serial_stream")[start:end]
-    
 
-    @property
-    def iris_message_object(self):
-        return object.__getattribute__(self, "_iris_message_wrapper")
+# out-of-band pickle: _OUT_OF_BAND_ENVELOPE, the number of buffers (u32), the size of the in-band pickle
+# (u64), the size of each buffer (u64), then the in-band pickle and the buffers
+_out_of_band_header = struct.Struct("<IQ")
 
-    def update_iris_message_object(self):
-        new_stream = iris._Stream.GlobalCharacter._New()
-        chunk_size = BELOW_MAX_STRING
-        start = 0
-        iteration = 0
-        chunk = self.chunks_from_python(iteration, start, start + chunk_size)
-        while chunk:
-            new_stream.Write(chunk)
-            iteration = iteration + 1
-            start = start + chunk_size
-            chunk = self.chunks_from_python(iteration, start, start + chunk_size)
-        self._iris_message_wrapper.SerializedStream = new_stream
-        self.create_iris_message_object_properties(self._iris_message_wrapper)
-        ## reset _Serial_stream to empty string as it has no purpose
-        object.__setattr__(self, "_serial_stream", "")
-
-    def create_iris_message_object_properties(self, message_object):
-        for prop in self._column_field_names:
-            setattr(message_object, snake_to_pascal(prop), getattr(self, prop))
+
+class _OutOfBandPickle(io.BytesIO):
+    """The in-band part of an out-of-band pickle, with the buffers it refers to in .buffers"""
+
+    def __init__(self, in_band, buffers):
+        super().__init__(in_band)
+        self.buffers = buffers
+
+    @classmethod
+    def read_from(cls, reader):
+        count, in_band_size = _out_of_band_header.unpack(reader.read(_out_of_band_header.size))
+        sizes = struct.unpack(f"<{count}Q", reader.read(8 * count))
+        in_band = reader.read(in_band_size)
+        # each buffer is read straight from the stream into a bytearray allocated at its final size, which
+        # bytearray fields and NumPy arrays then use without another copy
+        buffers = []
+        for size in sizes:
+            buffer = bytearray(size)
+            view = memoryview(buffer)
+            filled = 0
+            while filled < size:
+                read = reader.readinto(view[filled:])
+                if not read:
+                    raise ValueError("Out-of-band pickle payload is truncated")
+                filled += read
+            buffers.append(buffer)
+        return cls(in_band, buffers)
+
+    @staticmethod
+    def write_to(writer, in_band, buffers):
+        writer.write(_OUT_OF_BAND_ENVELOPE + _out_of_band_header.pack(len(buffers), len(in_band))
+                     + struct.pack(f"<{len(buffers)}Q", *(len(buffer) for buffer in buffers)))
+        writer.write(in_band)
+        for buffer in buffers:
+            # written to IRIS straight from the memory of the pickled object
+            writer.write(buffer)
+
+
+class _OutOfBandBytes:
+    """Stand-in for a large bytes or bytearray field value: pickles it out-of-band and unpickles to its type."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __reduce_ex__(self, protocol):
+        rebuild = bytes if type(self.data) is bytes else _bytearray_from_buffer
+        return rebuild, (pickle.PickleBuffer(self.data),)
+
+
+def _bytearray_from_buffer(buffer):
+    return buffer if type(buffer) is bytearray else bytearray(buffer)
+
+
+def _array_from_buffer(typecode, byteorder, buffer):
+    values = array(typecode)
+    values.frombytes(buffer)
+    if byteorder != sys.byteorder:
+        values.byteswap()
+    return values
+
+
+def _is_large_buffer(value):
+    return (type(value) is bytes or type(value) is bytearray) and len(value) >= OUT_OF_BAND_MIN
+
+
+def _out_of_band_value(value):
+    if _is_large_buffer(value):
+        return _OutOfBandBytes(value)
+    kind = type(value)
+    if (kind is list or kind is tuple) and any(_is_large_buffer(item) for item in value):
+        return kind(_OutOfBandBytes(item) if _is_large_buffer(item) else item for item in value)
+    return value
+
+
+class _OutOfBandPickler(pickle.Pickler):
+    """
+    Pickler (protocol 5) that hands large array.array objects, and large bytes/bytearray values of message
+    fields (directly or in a list/tuple field), to buffer_callback instead of copying them into the pickle.
+    Objects that support out-of-band pickling themselves, such as NumPy arrays, are handed over as well.
+    Exact bytes and bytearray objects never reach reducer_override, hence the field level substitution.
+    """
+
+    def reducer_override(self, obj):
+        kind = type(obj)
+        if kind is array:
+            if len(obj) * obj.itemsize >= OUT_OF_BAND_MIN:
+                return _array_from_buffer, (obj.typecode, sys.byteorder, pickle.PickleBuffer(obj))
+        elif isinstance(obj, ProductionMessage):
+            reduced = obj.__reduce_ex__(5)
+            state = reduced[2]
+            if isinstance(state, tuple):
+                state = (state[0] and {k: _out_of_band_value(v) for k, v in state[0].items()}, state[1])
+            elif isinstance(state, dict):
+                state = {k: _out_of_band_value(v) for k, v in state.items()}
+            return (*reduced[:2], state, *reduced[3:])
+        return NotImplemented
+
+
+def _unpickle_payload(reader):
+    payload = _open_payload(reader)
+    return pickle.load(payload, buffers=getattr(payload, "buffers", None))
 
 
 def unpickle_binary(iris_message_object,MsgCls):
 
-    chunk_size = BELOW_MAX_STRING
-    iteration = 0
-    chunks = []
-    while True:
-        part = iris_message_object.chunksFromIRIS(iteration, chunk_size)
-        if not part:
-            break
-        chunks.append(part)
-        iteration += 1
+    if MsgCls._lazy:
+        this_object = MsgCls.__new__(MsgCls)
+        this_object._rehydrate_lazily(iris_message_object)
+        return this_object
 
-    binary_serial_msg = b"".join(chunks)
+    # pickle.load pulls the stream chunk by chunk, the pickle is never joined into a single bytes object
+    reader = _SerializedStreamReader(iris_message_object)
 
-    if binary_serial_msg:
-        this_object = pickle.loads(binary_serial_msg)
-        this_object._iris_message_wrapper = iris_message_object
+    if not reader.at_end():
+        this_object = _unpickle_payload(reader)
+        object.__setattr__(this_object, "_iris_message_wrapper", iris_message_object)
+        this_object._mark_serialized()
     else: 
         this_object = MsgCls()
-        for name in this_object._column_field_names:
-            if (val:=getattr(iris_message_object,snake_to_pascal(name))) != "":
-                setattr(this_object, name, val)
+        for name, val in MsgCls._read_columns(iris_message_object).items():
+            setattr(this_object, name, val)
 
     return this_object
 
@@ -931,51 +2568,738 @@ class PickleSerialize(ProductionMessage):
     as pickle deserialization can execute arbitrary code.
     """
         
-    __slots__ = ("_serial_stream",)
+    __slots__ = ()
 
-    def __init_subclass__(cls, **kwargs):
+    # large buffers are pickled out-of-band (protocol 5) and written to IRIS without being copied into the
+    # pickle. Set per class with: class MyMessage(PickleSerialize, out_of_band=True)
+    _out_of_band = False
+
+    def __init_subclass__(cls, out_of_band=None, **kwargs):
         super().__init_subclass__(**kwargs)
         cls._serializer_class = "PickleSerialize"
+        if out_of_band is not None:
+            cls._out_of_band = bool(out_of_band)
 
     def __init__(self, *args, iris_message_object=None, **kwargs):
-        ## initialize _serial_stream to empty string as it is only temporarily holding a value, before and after that it must stay empty
-        object.__setattr__(self, "_serial_stream", "")
         super().__init__(*args,iris_message_object=iris_message_object,json_str_or_dict=None,
                          serializer="pickle",**kwargs,
                          )
 
-    def chunks_from_python(self, iteration, start, end):
+    def _load_payload(self):
+        reader = _SerializedStreamReader(self._iris_message_wrapper)
+        if reader.at_end():
+            return None
+        return vars(_unpickle_payload(reader))
 
-        if iteration == 0:
-            import pickle
+    def _dump_out_of_band(self, writer):
+        """
+        Pickle the message with its large buffers out-of-band. The in-band part is pickled in memory first,
+        as its size goes in the header; a message without large buffers is written as a plain pickle.
+        """
+        in_band = io.BytesIO()
+        buffers = []
 
-            temp = self._iris_message_wrapper
-            self._iris_message_wrapper = ""  ## can't pickle this
-            object.__setattr__(self,"_serial_stream",
-                pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL, fix_imports=False),
-            )
-            self._iris_message_wrapper = temp
+        def out_of_band(buffer):
+            try:
+                buffers.append(buffer.raw())
+            except BufferError:
+                # not contiguous, keep it in-band
+                return True
+            return False
+
+        _OutOfBandPickler(in_band, protocol=5, fix_imports=False, buffer_callback=out_of_band).dump(self)
+        if buffers:
+            _OutOfBandPickle.write_to(writer, in_band.getbuffer(), buffers)
+        else:
+            writer.write(in_band.getbuffer())
+
+    def update_iris_message_object(self):
+        """
+        Pickle the message straight into a new SerializedStream (or SerializedData, see inline_max). The
+        pickler writes through _IRISStreamWriter, so only one chunk of the pickle is held in memory at a time.
+
+        With track_changes, an unchanged message keeps its current payload, and only the columns of changed
+        fields are written.
+        """
+        changed = self._changed_fields()
+        if changed is not None and not changed:
+            return
+        self._materialize()
+        writer = type(self)._payload_writer(binary=True)
+        temp = self._iris_message_wrapper
+        object.__setattr__(self, "_iris_message_wrapper", "")  ## can't pickle this
+        if type(self)._track_changes:
+            # the set of changed fields is not part of the message
+            object.__setattr__(self, "_changed", None)
+        try:
+            if type(self)._out_of_band:
+                self._dump_out_of_band(writer)
+            else:
+                pickle.Pickler(writer, protocol=pickle.HIGHEST_PROTOCOL, fix_imports=False).dump(self)
+        finally:
+            object.__setattr__(self, "_iris_message_wrapper", temp)
+        writer.close(self._iris_message_wrapper)
+        self.create_iris_message_object_properties(self._iris_message_wrapper, changed)
+        self._mark_serialized()
+
+    def create_iris_message_object_properties(self, message_object, changed=None):
+        names = self._column_field_names
+        self._write_columns(message_object, names if changed is None else [name for name in names if name in changed])
+
+
+# CompactSerialize payload: _COMPACT_VERSION, the list of field names, then one tagged value per field in the
+# same order. All numbers are little-endian
+_COMPACT_VERSION = b"\x02"
+_compact_len = struct.Struct("<I")
+_compact_int8 = struct.Struct("<b")
+_compact_int32 = struct.Struct("<i")
+_compact_int = struct.Struct("<q")
+_compact_float = struct.Struct("<d")
+# lists at least this long made of only ints, only floats or only strs are stored as one typed array
+_COMPACT_ARRAY_MIN = 16
+# typecodes of the arrays of ints, from the smallest, with the limit of the values they hold
+_COMPACT_INT_ARRAYS = [(code, 1 << (array(code).itemsize * 8 - 1)) for code in ("b", "h", "i", "q")]
+_INT64_MIN, _INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def _compact_array(values, typecode):
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed
+
+
+def _compact_encode_value(value, out):
+    kind = type(value)
+    if kind is str:
+        data = value.encode("utf-8")
+        if len(data) < 256:
+            out += b"S"
+            out.append(len(data))
+        else:
+            out += b"s"
+            out += _compact_len.pack(len(data))
+        out += data
+    elif kind is int:
+        if -128 <= value <= 127:
+            out += b"c"
+            out += _compact_int8.pack(value)
+        elif -0x80000000 <= value <= 0x7FFFFFFF:
+            out += b"k"
+            out += _compact_int32.pack(value)
+        elif _INT64_MIN <= value <= _INT64_MAX:
+            out += b"i"
+            out += _compact_int.pack(value)
+        else:
+            data = value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+            out += b"I"
+            out += _compact_len.pack(len(data))
+            out += data
+    elif kind is float:
+        out += b"d"
+        out += _compact_float.pack(value)
+    elif value is None:
+        out += b"N"
+    elif kind is bool:
+        out += b"T" if value else b"F"
+    elif kind is list or kind is tuple:
+        count = len(value)
+        first = type(value[0]) if count else None
+        if first is dict and count > 1:
+            keys = value[0].keys()
+            if all(type(item) is dict and item.keys() == keys for item in value):
+                # a table: the keys are stored once, then the values of each key as one list, which
+                # long columns of ints, floats or strs store as typed arrays
+                keys = list(keys)
+                out += b"t"
+                _compact_encode_value(keys, out)
+                for key in keys:
+                    _compact_encode_value([item[key] for item in value], out)
+                return
+        if count >= _COMPACT_ARRAY_MIN:
+            if first is str and all(type(item) is str for item in value):
+                # the end of each str in characters, then all of them as one UTF-8 string
+                data = "".join(value).encode("utf-8")
+                out += b"A"
+                out += _compact_len.pack(count)
+                out += _compact_array(accumulate(map(len, value)), "q")
+                out += _compact_len.pack(len(data))
+                out += data
+                return
+            if first is float and all(type(item) is float for item in value):
+                out += b"D"
+                out += _compact_len.pack(count)
+                out += _compact_array(value, "d")
+                return
+            if first is int and all(type(item) is int for item in value):
+                low, high = min(value), max(value)
+                typecode = next((code for code, limit in _COMPACT_INT_ARRAYS if -limit <= low and high < limit), None)
+                if typecode is not None:
+                    out += b"Q"
+                    out += typecode.encode()
+                    out += _compact_len.pack(count)
+                    out += _compact_array(value, typecode)
+                    return
+            if (first is list or first is tuple) and all(type(item) is list or type(item) is tuple for item in value):
+                # the length of each list, then all their items as one list, so that lists of rows
+                # nested in a list are stored as one table
+                out += b"n"
+                _compact_encode_value([len(item) for item in value], out)
+                _compact_encode_value([item for items in value for item in items], out)
+                return
+        out += b"l"
+        out += _compact_len.pack(count)
+        for item in value:
+            _compact_encode_value(item, out)
+    elif kind is dict:
+        out += b"m"
+        out += _compact_len.pack(len(value))
+        for key, item in value.items():
+            _compact_encode_value(key, out)
+            _compact_encode_value(item, out)
+    elif kind is bytes or kind is bytearray or kind is memoryview:
+        data = memoryview(value).cast("B")
+        out += b"b"
+        out += _compact_len.pack(len(data))
+        out += data
+    # subclasses, e.g. an IntEnum or a str based Enum, are stored as their base type
+    elif isinstance(value, bool):
+        _compact_encode_value(bool(value), out)
+    elif isinstance(value, int):
+        _compact_encode_value(int(value), out)
+    elif isinstance(value, float):
+        _compact_encode_value(float(value), out)
+    elif isinstance(value, str):
+        _compact_encode_value(str(value), out)
+    elif isinstance(value, (list, tuple)):
+        _compact_encode_value(list(value), out)
+    elif isinstance(value, dict):
+        _compact_encode_value(dict(value), out)
+    else:
+        raise TypeError(f"Object of type {kind.__name__} is not supported by CompactSerialize")
+
+
+def _compact_header(names):
+    """Return the header of the CompactSerialize payloads of a class with these fields."""
+    out = bytearray(_COMPACT_VERSION)
+    _compact_encode_value(list(names), out)
+    return bytes(out)
+
+
+def _compact_encode(header, values):
+    """Return a CompactSerialize payload: the header of the class (see _compact_header), then the field values."""
+    out = bytearray(header)
+    for value in values:
+        _compact_encode_value(value, out)
+    return out
+
+
+def _compact_decode_value(data, position):
+    tag = data[position]
+    position += 1
+    if tag == 0x53:  # S
+        size = data[position]
+        position += 1
+        return str(data[position:position + size], "utf-8"), position + size
+    if tag == 0x63:  # c
+        return _compact_int8.unpack_from(data, position)[0], position + 1
+    if tag == 0x6B:  # k
+        return _compact_int32.unpack_from(data, position)[0], position + 4
+    if tag == 0x73:  # s
+        (size,) = _compact_len.unpack_from(data, position)
+        position += 4
+        return str(data[position:position + size], "utf-8"), position + size
+    if tag == 0x69:  # i
+        return _compact_int.unpack_from(data, position)[0], position + 8
+    if tag == 0x64:  # d
+        return _compact_float.unpack_from(data, position)[0], position + 8
+    if tag == 0x4E:  # N
+        return None, position
+    if tag == 0x54:  # T
+        return True, position
+    if tag == 0x46:  # F
+        return False, position
+    if tag == 0x6C:  # l
+        (count,) = _compact_len.unpack_from(data, position)
+        position += 4
+        if data[position:position + count] == b"N" * count:
+            # only None, e.g. a column of a table that is never set
+            return [None] * count, position + count
+        items = []
+        for _ in range(count):
+            item, position = _compact_decode_value(data, position)
+            items.append(item)
+        return items, position
+    if tag == 0x74:  # t
+        keys, position = _compact_decode_value(data, position)
+        columns = []
+        for _ in keys:
+            column, position = _compact_decode_value(data, position)
+            columns.append(column)
+        return [dict(zip(keys, row)) for row in zip(*columns)], position
+    if tag == 0x41:  # A
+        (count,) = _compact_len.unpack_from(data, position)
+        position += 4
+        ends = array("q")
+        ends.frombytes(data[position:position + count * 8])
+        if sys.byteorder == "big":
+            ends.byteswap()
+        position += count * 8
+        (size,) = _compact_len.unpack_from(data, position)
+        position += 4
+        text = str(data[position:position + size], "utf-8")
+        return [text[start:end] for start, end in zip(chain((0,), ends), ends)], position + size
+    if tag == 0x6D:  # m
+        (count,) = _compact_len.unpack_from(data, position)
+        position += 4
+        items = {}
+        for _ in range(count):
+            key, position = _compact_decode_value(data, position)
+            items[key], position = _compact_decode_value(data, position)
+        return items, position
+    if tag == 0x51 or tag == 0x44:  # Q, D
+        if tag == 0x51:
+            packed = array(chr(data[position]))
+            position += 1
+        else:
+            packed = array("d")
+        (count,) = _compact_len.unpack_from(data, position)
+        position += 4
+        end = position + count * packed.itemsize
+        packed.frombytes(data[position:end])
+        if sys.byteorder == "big":
+            packed.byteswap()
+        return packed.tolist(), end
+    if tag == 0x6E:  # n
+        lengths, position = _compact_decode_value(data, position)
+        items, position = _compact_decode_value(data, position)
+        ends = list(accumulate(lengths))
+        return [items[start:end] for start, end in zip(chain((0,), ends), ends)], position
+    if tag == 0x62:  # b
+        (size,) = _compact_len.unpack_from(data, position)
+        position += 4
+        return bytes(data[position:position + size]), position + size
+    if tag == 0x49:  # I
+        (size,) = _compact_len.unpack_from(data, position)
+        position += 4
+        return int.from_bytes(data[position:position + size], "little", signed=True), position + size
+    raise ValueError(f"Invalid CompactSerialize payload, unknown tag {tag!r} at {position - 1}")
+
+
+def _compact_decode(data, header, names):
+    """
+    Return the fields stored in a CompactSerialize payload as a dict. header and names are those of the class
+    reading it: payloads written with other fields, e.g. before a field was added, removed or moved, are
+    matched by the field names they carry, and fields the class does not have are left out.
+    """
+    if data[:len(header)] == header:
+        payload_names, position = names, len(header)
+    elif data[:1] == _COMPACT_VERSION:
+        payload_names, position = _compact_decode_value(data, 1)
+    else:
+        raise ValueError(f"Unsupported CompactSerialize payload version {bytes(data[:1])!r}")
+    values = {}
+    for name in payload_names:
+        values[name], position = _compact_decode_value(data, position)
+    if payload_names is not names:
+        values = {name: values[name] for name in names if name in values}
+    return values
+
+
+class CompactSerialize(ProductionMessage):
+
+    """
+    Stores the declared fields in a compact binary format: a header with the field names, the same for every
+    message of the class, then the values tagged and packed in that order. Lists of dicts sharing their keys
+    are stored column by column. Only None, bool, int, float, str, bytes, lists/tuples and dicts of those can
+    be stored, so unlike PickleSerialize, reading a message never runs any code and does not depend on
+    python class paths. Tuples come back as lists, bytearrays as bytes.
+    """
+
+    __slots__ = ()
 
-        return object.__getattribute__(self, "_serial_stream")[start:end]
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._serializer_class = "CompactSerialize"
+        cls._compact_header = _compact_header(cls._field_names)
+
+    def __init__(self,*args,iris_message_object=None,json_str_or_dict=None,serializer="compact",**kwargs,):
+        if (iris_message_object is not None) and (json_str_or_dict is None):
+            if type(self)._lazy and not (args or kwargs):
+                self._rehydrate_lazily(iris_message_object)
+                return
+            json_str_or_dict = type(self)._read_payload(iris_message_object)
+            if json_str_or_dict is None:
+                json_str_or_dict = ""
+        super().__init__(*args,iris_message_object=iris_message_object,json_str_or_dict=json_str_or_dict,
+            serializer=serializer,**kwargs,)
+
+    @classmethod
+    def _read_payload(cls, iris_message_object):
+        reader = _SerializedStreamReader(iris_message_object)
+        if reader.at_end():
+            return None
+        return _compact_decode(_open_payload(reader).read(), cls._compact_header, cls._field_names)
+
+    def _load_payload(self):
+        return self._read_payload(self._iris_message_wrapper)
+
+    def update_iris_message_object(self):
+        """
+        Encode the message into a new SerializedStream (or SerializedData, see inline_max).
+
+        With track_changes, an unchanged message keeps its current payload, and only the columns of changed
+        fields are written.
+        """
+        changed = self._changed_fields()
+        if changed is not None and not changed:
+            return
+        self._materialize()
+        cls = type(self)
+        writer = cls._payload_writer(binary=True)
+        writer.write(_compact_encode(cls._compact_header, [getattr(self, name) for name in cls._field_names]))
+        writer.close(self._iris_message_wrapper)
+        self.create_iris_message_object_properties(self._iris_message_wrapper, changed)
+        self._mark_serialized()
+
+    def create_iris_message_object_properties(self, message_object, changed=None):
+        names = self._column_field_names
+        self._write_columns(message_object, names if changed is None else [name for name in names if name in changed])
+
+
+# RecordBatch payload: _RECORD_BATCH_VERSION, the number of rows (u32) and of record fields (u16), then for
+# each record field its name (u8 length + UTF-8), type code, data length (u32) and data, and last the batch
+# level fields encoded as in CompactSerialize. Numbers are little-endian
+_RECORD_BATCH_VERSION = b"RB\x01"
+_record_batch_header = struct.Struct("<IH")
+_record_column_header = struct.Struct("<cI")
+# type name of a record field -> type code in the payload. int, float and bool values are held in arrays of
+# that typecode; str and bytes values are stored as u32 end offsets followed by the concatenated data
+_RECORD_TYPES = {"int": "q", "float": "d", "bool": "B", "str": "s", "bytes": "y"}
+_RECORD_SUMMARIES = ("min", "max", "sum", "count")
+# record field types stored as the concatenation of their encoded values, which cannot hold None
+_RECORD_TEXT_TYPES = {"str": str, "bytes": bytes}
+# type codes of the record fields each summary can be computed over; the min and max of bytes would not fit
+# the %VarString property of the summary
+_SUMMARY_RECORD_TYPES = {"min": "qdBs", "max": "qdBs", "sum": "qdB"}
+
+
+def _record_array(values, typecode):
+    packed = array(typecode, values)
+    if sys.byteorder == "big" and typecode != "B":
+        packed.byteswap()
+    return packed
+
+
+class RecordBatch(ProductionMessage):
+
+    """
+    A message holding many records, stored column by column. The annotated fields of the class (int, float,
+    bool, str or bytes) are the fields of every record; int, float and bool values are kept in typed arrays.
+    Fields declared as Column(summary=..., of=...) are computed from the records ("min", "max" or "sum" of
+    a record field, or the "count" of records), so the batches can be filtered with SQL. Every other field
+    holds one value for the whole batch.
+    """
+
+    __slots__ = ()
+
+    _compile_constructor = False
+
+    def __init_subclass__(cls, lazy=None, **kwargs):
+        if lazy:
+            raise TypeError("RecordBatch messages cannot be declared lazy")
+        super().__init_subclass__(**kwargs)
+        cls._serializer_class = "RecordBatch"
+
+        annotations = cls.__dict__.get("__annotations__", {})
+        record_types, record_defaults, summaries, batch_fields = {}, {}, {}, []
+        for name in cls._field_names:
+            value = cls.__dict__.get(name, _NO_DEFAULT)
+            if isinstance(value, Column):
+                summary = value.extra.get("summary")
+                if summary is not None:
+                    summaries[name] = (summary, value.extra.get("of"))
+                    continue
+            elif name in annotations:
+                type_name = getattr(annotations[name], "__name__", annotations[name])
+                if type_name in _RECORD_TYPES:
+                    text_type = _RECORD_TEXT_TYPES.get(type_name)
+                    if text_type is not None and value is not _NO_DEFAULT and not isinstance(value, text_type):
+                        # str and bytes columns have no null value, sending the batch would fail on such a default
+                        raise TypeError(
+                            f"{cls.__name__}.{name}: the default of a {type_name} record field must be "
+                            f"{text_type()!r} or another {type_name} value, not {value!r}"
+                        )
+                    record_types[name] = _RECORD_TYPES[type_name]
+                    record_defaults[name] = value
+                    continue
+            batch_fields.append(name)
+
+        for name, (summary, of) in summaries.items():
+            if summary not in _RECORD_SUMMARIES:
+                raise ValueError(f"{cls.__name__}.{name}: summary must be one of {', '.join(_RECORD_SUMMARIES)}")
+            if summary != "count" and of not in record_types:
+                raise ValueError(f"{cls.__name__}.{name}: of= must name a record field")
+            if summary != "count" and record_types[of] not in _SUMMARY_RECORD_TYPES[summary]:
+                type_name = next(name for name, code in _RECORD_TYPES.items() if code == record_types[of])
+                raise TypeError(f"{cls.__name__}.{name}: cannot compute the {summary} of the {type_name} field {of!r}")
+            # the value is computed from the records whenever it is read
+            setattr(cls, name, property(lambda self, name=name: self._summary(name)))
+
+        cls._record_types = record_types
+        cls._record_defaults = record_defaults
+        cls._summaries = summaries
+        cls._batch_fields = batch_fields
+        cls._compact_header = _compact_header(batch_fields)
+        cls.Row = namedtuple(f"{cls.__name__}Row", list(record_types), rename=True)
+
+    def __init__(self, rows=(), *, iris_message_object=None, **fields):
+        cls = type(self)
+        if iris_message_object is not None:
+            if rows or fields:
+                raise TypeError("Either provide only iris_message_object, or use rows/fields to create a new object.")
+            self._read_batch(iris_message_object)
+            object.__setattr__(self, "_iris_message_wrapper", iris_message_object)
+            self._mark_serialized()
+            return
+
+        for key in fields:
+            if key not in cls._batch_fields:
+                raise TypeError(f"{cls.__name__}() got unexpected argument '{key}'")
+        iris_message_object = getattr(getattr(iris, cls._iris_package), cls.__name__)._New()
+        self._clear()
+        for name in cls._batch_fields:
+            if name in fields:
+                value = fields[name]
+            else:
+                value = getattr(cls, name, None)
+                if isinstance(value, Column):
+                    value = value.get_default()
+            setattr(self, name, value)
+        self.extend(rows)
+        object.__setattr__(self, "_iris_message_wrapper", iris_message_object)
+
+    @classmethod
+    def from_columns(cls, **columns):
+        """
+        Create a batch from one sequence of values per record field, e.g.
+        Readings.from_columns(sensor=["a", "b"], value=[1.5, 2.0]). Batch level fields are set afterwards.
+        """
+        batch = cls()
+        sizes = {len(values) for values in columns.values()}
+        if len(sizes) > 1:
+            raise ValueError("All columns must have the same length")
+        size = sizes.pop() if sizes else 0
+        for name, typecode in cls._record_types.items():
+            if name in columns:
+                values = columns.pop(name)
+            elif cls._record_defaults[name] is not _NO_DEFAULT:
+                values = [cls._record_defaults[name]] * size
+            else:
+                raise TypeError(f"{cls.__name__}.from_columns() missing column '{name}'")
+            batch._columns[name] = list(values) if typecode in "sy" else array(typecode, values)
+        if columns:
+            raise TypeError(f"{cls.__name__}.from_columns() got unexpected column '{next(iter(columns))}'")
+        batch._size = size
+        return batch
+
+    def _clear(self):
+        object.__setattr__(self, "_columns", {
+            name: [] if typecode in "sy" else array(typecode) for name, typecode in type(self)._record_types.items()
+        })
+        object.__setattr__(self, "_size", 0)
+
+    def append(self, row=None, **values):
+        """Add one record, given as a mapping, as a sequence in field order, or as keyword arguments."""
+        cls = type(self)
+        if row is not None:
+            if values:
+                raise TypeError("append() takes a row or keyword arguments, not both")
+            if isinstance(row, dict):
+                values = row
+            else:
+                row = tuple(row)
+                if len(row) != len(cls._record_types):
+                    raise TypeError(f"{cls.__name__} records have {len(cls._record_types)} fields, got {len(row)}")
+                values = dict(zip(cls._record_types, row))
+        for key in values:
+            if key not in cls._record_types:
+                raise TypeError(f"{cls.__name__} records have no field '{key}'")
+
+        appended = []
+        try:
+            for name in cls._record_types:
+                value = values.get(name, cls._record_defaults[name])
+                if value is _NO_DEFAULT:
+                    raise TypeError(f"{cls.__name__} record is missing field '{name}'")
+                self._columns[name].append(value)
+                appended.append(name)
+        except (TypeError, OverflowError):
+            # keep the columns the same length
+            for name in appended:
+                self._columns[name].pop()
+            raise
+        object.__setattr__(self, "_size", self._size + 1)
+        if cls._track_changes:
+            object.__setattr__(self, "_changed", None)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        return self._size
+
+    def _column_values(self, name):
+        values = self._columns[name]
+        return map(bool, values) if type(self)._record_types[name] == "B" else values
+
+    def __iter__(self):
+        """Iterate over the records as namedtuples (cls.Row)."""
+        make = type(self).Row._make
+        return map(make, zip(*(self._column_values(name) for name in self._columns)))
+
+    def __getitem__(self, index):
+        if not -self._size <= index < self._size:
+            raise IndexError("record index out of range")
+        return type(self).Row._make(
+            bool(values[index]) if type(self)._record_types[name] == "B" else values[index]
+            for name, values in self._columns.items()
+        )
+
+    def column(self, name):
+        """
+        Return the values of a record field. int, float and bool fields are returned as the array.array
+        holding them (bool as 0/1 bytes), which supports the buffer protocol: memoryview(column) and
+        numpy.frombuffer(column, dtype=...) give views on it without copying. str and bytes fields are lists.
+        """
+        return self._columns[name]
+
+    def to_numpy(self, name):
+        """Return the values of a record field as a numpy array, sharing memory with int/float/bool columns."""
+        import numpy
+
+        values = self._columns[name]
+        typecode = type(self)._record_types[name]
+        if typecode in "sy":
+            return numpy.array(values)
+        return numpy.frombuffer(values, dtype={"q": "<i8", "d": "<f8", "B": "?"}[typecode])
+
+    def _summary(self, name):
+        summary, of = type(self)._summaries[name]
+        if summary == "count":
+            return self._size
+        values = list(self._column_values(of)) if type(self)._record_types[of] == "B" else self._columns[of]
+        if summary == "sum":
+            return sum(values)
+        if not values:
+            return None
+        return min(values) if summary == "min" else max(values)
+
+    def __repr__(self):
+        cls = type(self)
+        items = ", ".join(f"{n}={getattr(self, n)!r}" for n in (*cls._batch_fields, *cls._summaries))
+        return f"{cls.__name__}({len(self)} records{', ' if items else ''}{items})"
+
+    def _write_batch(self, writer):
+        cls = type(self)
+        writer.write(_RECORD_BATCH_VERSION + _record_batch_header.pack(self._size, len(cls._record_types)))
+        for name, typecode in cls._record_types.items():
+            values = self._columns[name]
+            if typecode in "sy":
+                data = [value.encode("utf-8") for value in values] if typecode == "s" else values
+                ends = _record_array(accumulate(len(value) for value in data), "I")
+                parts = [memoryview(ends).cast("B"), b"".join(data)]
+            else:
+                if sys.byteorder == "big" and typecode != "B":
+                    values = _record_array(values, typecode)
+                parts = [memoryview(values).cast("B")]
+            encoded_name = name.encode("utf-8")
+            writer.write(bytes([len(encoded_name)]) + encoded_name
+                         + _record_column_header.pack(typecode.encode(), sum(len(part) for part in parts)))
+            for part in parts:
+                # the arrays are written to IRIS from their own memory
+                writer.write(part)
+        writer.write(_compact_encode(cls._compact_header, [getattr(self, name) for name in cls._batch_fields]))
+
+    def _read_batch(self, iris_message_object):
+        cls = type(self)
+        self._clear()
+        reader = _SerializedStreamReader(iris_message_object)
+        if reader.at_end():
+            # created on the IRIS side (e.g. testing service), there are no records
+            names = [name for name in cls._batch_fields if name in cls._column_field_names]
+            for name, val in cls._read_columns(iris_message_object, names).items():
+                setattr(self, name, val)
+            return
+        data = memoryview(_open_payload(reader).read())
+        if data[:3] != _RECORD_BATCH_VERSION:
+            raise ValueError(f"Unsupported RecordBatch payload version {bytes(data[:3])!r}")
+        size, column_count = _record_batch_header.unpack_from(data, 3)
+        position = 3 + _record_batch_header.size
+        for _ in range(column_count):
+            name_size = data[position]
+            name = str(data[position + 1:position + 1 + name_size], "utf-8")
+            position += 1 + name_size
+            typecode, data_size = _record_column_header.unpack_from(data, position)
+            position += _record_column_header.size
+            typecode = typecode.decode()
+            column = data[position:position + data_size]
+            position += data_size
+            if name not in cls._record_types:
+                # field removed from the class since the message was stored
+                continue
+            if typecode in "sy":
+                ends = array("I")
+                ends.frombytes(column[:4 * size])
+                if sys.byteorder == "big":
+                    ends.byteswap()
+                blob = column[4 * size:]
+                starts = [0, *ends[:-1]]
+                if typecode == "y":
+                    values = [bytes(blob[start:end]) for start, end in zip(starts, ends)]
+                else:
+                    text = str(blob, "utf-8")
+                    if len(text) == len(blob):
+                        # ASCII only, byte offsets are character offsets
+                        values = [text[start:end] for start, end in zip(starts, ends)]
+                    else:
+                        values = [str(blob[start:end], "utf-8") for start, end in zip(starts, ends)]
+            else:
+                values = array(typecode)
+                values.frombytes(column)
+                if sys.byteorder == "big" and typecode != "B":
+                    values.byteswap()
+            self._columns[name] = values
+        for name, default in cls._record_defaults.items():
+            # field added to the class since the message was stored
+            if len(self._columns[name]) != size:
+                if default is _NO_DEFAULT:
+                    default = {"s": "", "y": b""}.get(cls._record_types[name], 0)
+                self._columns[name] = ([default] * size if cls._record_types[name] in "sy"
+                                       else array(cls._record_types[name], [default]) * size)
+        object.__setattr__(self, "_size", size)
+        for name, value in _compact_decode(bytes(data[position:]), cls._compact_header, cls._batch_fields).items():
+            setattr(self, name, value)
 
     def update_iris_message_object(self):
-        new_stream = iris._Stream.GlobalBinary._New()
-        chunk_size = BELOW_MAX_STRING
-        start = 0
-        iteration = 0
-        chunk = self.chunks_from_python(iteration, start, start + chunk_size)
-        pickle_data_bytes = iris._SYS.Python.Bytes(chunk)
-        while pickle_data_bytes:
-            new_stream.Write(pickle_data_bytes)
-            iteration = iteration + 1
-            start = start + chunk_size
-            chunk = self.chunks_from_python(iteration, start, start + chunk_size)
-            pickle_data_bytes = iris._SYS.Python.Bytes(chunk)
-        self._iris_message_wrapper.SerializedStream = new_stream
-        self.create_iris_message_object_properties(self._iris_message_wrapper)
-        ## reset _Serial_stream to empty string as it has no purpose
-        object.__setattr__(self, "_serial_stream", "")
-
-    def create_iris_message_object_properties(self, message_object):
-        for prop in self._column_field_names:
-            setattr(message_object, snake_to_pascal(prop), getattr(self, prop))
+        """
+        Write the records into a new SerializedStream (or SerializedData, see inline_max) and store the
+        summary and batch level columns.
+
+        With track_changes, an unchanged batch keeps its current payload.
+        """
+        changed = self._changed_fields()
+        if changed is not None and not changed:
+            return
+        writer = type(self)._payload_writer(binary=True)
+        self._write_batch(writer)
+        writer.close(self._iris_message_wrapper)
+        self.create_iris_message_object_properties(self._iris_message_wrapper, changed)
+        self._mark_serialized()
+
+    def create_iris_message_object_properties(self, message_object, changed=None):
+        names = self._column_field_names
+        if changed is not None:
+            names = [name for name in names if name in changed or name in self._summaries]
+        self._write_columns(message_object, names)
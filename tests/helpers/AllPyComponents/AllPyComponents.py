@@ -1,3 +1,7 @@
+import functools
+import os
+import time
+
 from intersystems_pyprod import (
     IRISParameter,
     IRISProperty,
@@ -8,6 +12,8 @@ from intersystems_pyprod import (
     Column,
     JsonSerialize,
     PickleSerialize,
+    CompactSerialize,
+    RecordBatch,
     IRISLog,
     Status,
     debug_host,
@@ -23,6 +29,41 @@ class MyPickleData(PickleSerialize):
     name = Column()
     amount = 1
 
+class MyInlineJsonData(JsonSerialize, inline_max=2048):
+    name = Column()
+    amount = 0
+
+class MyLazyJsonData(JsonSerialize, lazy=True):
+    name = Column(datatype=str)
+    amount = 0
+
+class MyCompactData(CompactSerialize):
+    name = Column()
+    amount = 1
+
+class MyClaimCheckData(PickleSerialize, claim_check_above=16,
+                       claim_check_dir=os.path.join(os.path.dirname(os.path.abspath(__file__)), "claim_check")):
+    name = Column()
+    amount = 1
+
+class MyDecoratedData(CompactSerialize):
+    name = Column()
+    amount = 1
+
+    @functools.cached_property
+    def doubled(self):
+        return self.amount * 2
+
+    @functools.lru_cache
+    def label(self):
+        return self.name.upper()
+
+class MyRecordBatch(RecordBatch):
+    label: str
+    amount: int
+    name = Column()
+    total = Column(summary="sum", of="amount")
+
 class AdapterlessBS(BusinessService):
     TargetConfigName = IRISProperty(settings="Target")
     def OnProcessInput(self, input):
@@ -30,6 +71,31 @@ class AdapterlessBS(BusinessService):
         msg = MyJsonData(input)
         status, response = self.SendRequestSync(self.TargetConfigName, msg)
         return status, response
+
+class SnapshotBS(BusinessService):
+    snapshot_settings = True
+    TargetConfigName = IRISProperty(settings="Target")
+    def OnProcessInput(self, input):
+        if input == "refresh":
+            self.refresh_settings()
+        return Status.OK(), self.TargetConfigName
+
+class SendManyBS(BusinessService):
+    def OnProcessInput(self, input):
+        requests = [MyJsonData("first send_many request", 1), MyJsonData("second send_many request", 2)]
+        originals = list(requests)
+        statuses = self.send_many(["AllPyComponents.CustomBO", "AllPyComponents.NoSuchTarget"], requests)
+        sent = ",".join("OK" if status == 1 else "ERROR" for status in statuses)
+        unchanged = all(request is original for request, original in zip(requests, originals))
+        return Status.OK(), f"{sent} {len(requests) == len(originals) and unchanged}"
+
+class PackedResultBS(BusinessService):
+    def OnProcessInput(self, input):
+        if input == "status only":
+            return Status.OK()
+        if input == "plain response":
+            return Status.OK(), "plain response from PackedResultBS"
+        return Status.ERROR("error from PackedResultBS"), MyJsonData("response with error from PackedResultBS", 0)
     
 class CustomBP(BusinessProcess):
     TargetConfigName: str = IRISProperty(settings="Target")
@@ -39,15 +105,63 @@ class CustomBP(BusinessProcess):
             syncRequest = MyJsonData("MyJsonData request from BP to BO", 1)
         elif request.name == "testMyPickle":
             syncRequest = MyPickleData("MyPickleData request from BP to BO", 1)
+        elif request.name == "testMyInlineJson":
+            syncRequest = MyInlineJsonData("MyInlineJsonData request from BP to BO", 1)
+        elif request.name == "testMyLazyJson":
+            syncRequest = MyLazyJsonData("MyLazyJsonData request from BP to BO", 1)
+        elif request.name == "testMyCompact":
+            syncRequest = MyCompactData("MyCompactData request from BP to BO", 1)
+        elif request.name == "testMyRecordBatch":
+            syncRequest = MyRecordBatch([("a", 1), ("b", 2)], name="MyRecordBatch request from BP to BO")
+        elif request.name == "testMyClaimCheck":
+            syncRequest = MyClaimCheckData("MyClaimCheckData request from BP to BO", 41)
+        elif request.name == "testMyDecorated":
+            syncRequest = MyDecoratedData("MyDecoratedData request from BP to BO", 4)
         status, response = self.SendRequestSync(self.TargetConfigName, syncRequest)
         return status, response
 
 
+class GatherBP(BusinessProcess):
+    def OnRequest(self, request):
+        if request.name == "testGather":
+            requests = [MyJsonData("first scatter request", 1), MyJsonData("second scatter request", 2)]
+            return self.scatter("AllPyComponents.CustomBO", requests)
+        if request.name == "testGatherTimeout":
+            targets = ["AllPyComponents.CustomBO", "AllPyComponents.SlowBO"]
+            return self.scatter(targets, MyJsonData("scatter request with timeout", 1), timeout=1)
+        if request.name == "testGatherUnsent":
+            targets = ["AllPyComponents.CustomBO", "AllPyComponents.NoSuchTarget"]
+            return self.scatter(targets, MyJsonData("scatter request to a missing target", 1))
+        if request.name == "testGatherNoneSent":
+            return self.scatter(["AllPyComponents.NoSuchTarget"], MyJsonData("scatter request to a missing target", 1))
+        return self.scatter("AllPyComponents.CustomBO", [])
+
+    def OnGather(self, results):
+        names = ",".join("None" if result is None else result.name for result in results)
+        return Status.OK(), MyJsonData(f"gathered {len(results)}: {names}", len(results))
+
+
+class StepsBP(BusinessProcess):
+    def OnRequest(self, request):
+        first = yield ("AllPyComponents.CustomBO", MyJsonData("first step request", 1))
+        second, third = yield [
+            ("AllPyComponents.CustomBO", MyPickleData("second step request", 2)),
+            ("AllPyComponents.CustomBO", MyCompactData("third step request", 3)),
+        ]
+        return Status.OK(), MyJsonData(f"steps: {first.name}, {second.name}, {third.name}", 3)
+
+
 class CustomBO(BusinessOperation):
     ADAPTER = IRISParameter("AllPyComponents.CustomOutAdapter")
     MessageMap = {
         "AllPyComponents.MyJsonData": "BOmethod1",
-        "AllPyComponents.MyPickleData": "BOmethod2"
+        "AllPyComponents.MyPickleData": "BOmethod2",
+        "AllPyComponents.MyInlineJsonData": "BOmethod3",
+        "AllPyComponents.MyLazyJsonData": "BOmethod4",
+        "AllPyComponents.MyCompactData": "BOmethod5",
+        "AllPyComponents.MyRecordBatch": "BOmethod6",
+        "AllPyComponents.MyClaimCheckData": "BOmethod7",
+        "AllPyComponents.MyDecoratedData": "BOmethod8"
     }
 
     def BOmethod1(self, request):
@@ -62,8 +176,53 @@ class CustomBO(BusinessOperation):
         IRISLog.Info("Data received at BOmethod2 is: " + request.name)
         response = MyPickleData("response from BOmethod2", 0)
         return status, response
+
+    def BOmethod3(self, request):
+        status = Status.OK()
+        IRISLog.Info("Data received at BOmethod3 is: " + request.name)
+        response = MyInlineJsonData("response from BOmethod3", 0)
+        return status, response
+
+    def BOmethod4(self, request):
+        status = Status.OK()
+        IRISLog.Info("Data received at BOmethod4 is: " + request.name + " " + str(request.amount))
+        response = MyLazyJsonData("response from BOmethod4", request.amount + 1)
+        return status, response
+
+    def BOmethod5(self, request):
+        status = Status.OK()
+        IRISLog.Info("Data received at BOmethod5 is: " + request.name)
+        response = MyCompactData("response from BOmethod5", 0)
+        return status, response
+
+    def BOmethod6(self, request):
+        status = Status.OK()
+        IRISLog.Info(f"Data received at BOmethod6 is: {request.name}, {len(request)} records, total {request.total}")
+        response = MyRecordBatch(request, name=f"response from BOmethod6: {request.total}")
+        return status, response
+
+    def BOmethod7(self, request):
+        status = Status.OK()
+        IRISLog.Info("Data received at BOmethod7 is: " + request.name)
+        response = MyClaimCheckData(f"response from BOmethod7: {request.amount + 1}", 0)
+        return status, response
+
+    def BOmethod8(self, request):
+        status = Status.OK()
+        IRISLog.Info("Data received at BOmethod8 is: " + request.label())
+        fields = ",".join(MyDecoratedData._field_names)
+        response = MyDecoratedData(f"response from BOmethod8: {fields} {request.doubled}", 0)
+        return status, response
   
 
+class SlowBO(BusinessOperation):
+    MessageMap = {"AllPyComponents.MyJsonData": "SlowMethod"}
+
+    def SlowMethod(self, request):
+        time.sleep(3)
+        return Status.OK(), MyJsonData("response from SlowBO", 0)
+
+
 class CustomOutAdapter(OutboundAdapter):
     def OutAdapterMethod(self, information="default"):
         status = Status.OK()
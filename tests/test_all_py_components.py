@@ -95,3 +95,296 @@ def test_BOMethod2():
     adapterless.PythonClassObject = ""
     assert response == "response from BOmethod2", f"response was {response}"
 
+def test_BOMethod3():
+    """
+    This method tests a message class that stores small payloads inline instead of in a stream.
+    """
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.AdapterlessBS", mybs)
+    adapterless = mybs.value
+    adapterless.TargetConfigName = "AllPyComponents.CustomBP"
+    response = iris.ref()
+    status = adapterless.ProcessInput("testMyInlineJson",response)
+    response = response.value.name
+    adapterless.PythonClassObject = ""
+    assert response == "response from BOmethod3", f"response was {response}"
+
+def test_BOMethod4():
+    """
+    This method tests a message class that decodes its fields on first access.
+    """
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.AdapterlessBS", mybs)
+    adapterless = mybs.value
+    adapterless.TargetConfigName = "AllPyComponents.CustomBP"
+    response = iris.ref()
+    status = adapterless.ProcessInput("testMyLazyJson",response)
+    response = response.value.name
+    adapterless.PythonClassObject = ""
+    assert response == "response from BOmethod4", f"response was {response}"
+
+def test_BOMethod5():
+    """
+    This method tests a CompactSerialize message class.
+    """
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.AdapterlessBS", mybs)
+    adapterless = mybs.value
+    adapterless.TargetConfigName = "AllPyComponents.CustomBP"
+    response = iris.ref()
+    status = adapterless.ProcessInput("testMyCompact",response)
+    response = response.value.name
+    adapterless.PythonClassObject = ""
+    assert response == "response from BOmethod5", f"response was {response}"
+
+def test_BOMethod6():
+    """
+    This method tests a RecordBatch message class and its summary column.
+    """
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.AdapterlessBS", mybs)
+    adapterless = mybs.value
+    adapterless.TargetConfigName = "AllPyComponents.CustomBP"
+    response = iris.ref()
+    status = adapterless.ProcessInput("testMyRecordBatch",response)
+    response = response.value.name
+    adapterless.PythonClassObject = ""
+    assert response == "response from BOmethod6: 3", f"response was {response}"
+
+def test_BOMethod7():
+    """
+    This method tests a message class whose payload is stored in the claim-check store.
+    """
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.AdapterlessBS", mybs)
+    adapterless = mybs.value
+    adapterless.TargetConfigName = "AllPyComponents.CustomBP"
+    response = iris.ref()
+    status = adapterless.ProcessInput("testMyClaimCheck",response)
+    response = response.value.name
+    adapterless.PythonClassObject = ""
+    assert response == "response from BOmethod7: 42", f"response was {response}"
+
+def test_BOMethod8():
+    """
+    This method tests a message class with decorated methods, which must not be taken for fields.
+    """
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.AdapterlessBS", mybs)
+    adapterless = mybs.value
+    adapterless.TargetConfigName = "AllPyComponents.CustomBP"
+    response = iris.ref()
+    status = adapterless.ProcessInput("testMyDecorated",response)
+    response = response.value.name
+    adapterless.PythonClassObject = ""
+    assert response == "response from BOmethod8: name,amount 8", f"response was {response}"
+
+def test_packed_status_only():
+    """
+    This method tests a host callback that returns the status alone.
+    """
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.PackedResultBS", mybs)
+    packed = mybs.value
+    response = iris.ref()
+    status = packed.ProcessInput("status only", response)
+    packed.PythonClassObject = ""
+    assert status == 1, f"status was {status}"
+    assert response.value in (None, ""), f"response was {response.value}"
+
+def test_packed_tuple_plain_response():
+    """
+    This method tests a host callback that returns an OK status with a response that is not an IRIS object,
+    which the stub receives as a (status, response) tuple.
+    """
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.PackedResultBS", mybs)
+    packed = mybs.value
+    response = iris.ref()
+    status = packed.ProcessInput("plain response", response)
+    packed.PythonClassObject = ""
+    assert status == 1, f"status was {status}"
+    assert response.value == "plain response from PackedResultBS", f"response was {response.value}"
+
+def test_packed_tuple_error_status():
+    """
+    This method tests a host callback that returns an error status together with an IRIS response, which the
+    stub receives as a (status, response) tuple.
+    """
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.PackedResultBS", mybs)
+    packed = mybs.value
+    response = iris.ref()
+    status = packed.ProcessInput("error", response)
+    packed.PythonClassObject = ""
+    assert iris._SYSTEM.Status.IsError(status), f"status was {status}"
+    assert "error from PackedResultBS" in iris._SYSTEM.Status.GetErrorText(status)
+    assert response.value.name == "response with error from PackedResultBS", f"response was {response.value}"
+
+def test_snapshot_settings():
+    """
+    This method tests that a host with snapshot_settings keeps the setting read when it was built until
+    refresh_settings is called.
+    """
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.SnapshotBS", mybs)
+    snapshot = mybs.value
+    snapshot.TargetConfigName = "changed from ObjectScript"
+    response = iris.ref()
+    status = snapshot.ProcessInput("read", response)
+    before_refresh = response.value
+    response = iris.ref()
+    status = snapshot.ProcessInput("refresh", response)
+    after_refresh = response.value
+    snapshot.PythonClassObject = ""
+    assert before_refresh == "AllPyComponents.CustomBP", f"response was {before_refresh}"
+    assert after_refresh == "changed from ObjectScript", f"response was {after_refresh}"
+
+def test_send_many():
+    """
+    This method tests that send_many returns the status of each request, in order, and leaves the list of
+    requests passed to it unchanged.
+    """
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.SendManyBS", mybs)
+    sendmany = mybs.value
+    response = iris.ref()
+    status = sendmany.ProcessInput("send", response)
+    response = response.value
+    sendmany.PythonClassObject = ""
+    assert response == "OK,ERROR True", f"response was {response}"
+
+def scatter_through_gather_bp(name):
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.AdapterlessBS", mybs)
+    adapterless = mybs.value
+    adapterless.TargetConfigName = "AllPyComponents.GatherBP"
+    response = iris.ref()
+    status = adapterless.ProcessInput(name, response)
+    response = response.value.name
+    adapterless.PythonClassObject = ""
+    return response
+
+def test_scatter():
+    """
+    This method tests that scatter calls OnGather once with the responses of all its requests, in order.
+    """
+    response = scatter_through_gather_bp("testGather")
+    expected = "gathered 2: response from BOmethod1,response from BOmethod1"
+    assert response == expected, f"response was {response}"
+
+def test_scatter_timeout():
+    """
+    This method tests that a scatter with a timeout calls OnGather when it expires, with None in place of the
+    responses that did not arrive.
+    """
+    response = scatter_through_gather_bp("testGatherTimeout")
+    assert response == "gathered 2: response from BOmethod1,None", f"response was {response}"
+
+def test_scatter_no_requests():
+    """
+    This method tests that a scatter of no requests calls OnGather right away with an empty list.
+    """
+    response = scatter_through_gather_bp("testGatherNothing")
+    assert response == "gathered 0: ", f"response was {response}"
+
+def test_generator_steps():
+    """
+    This method tests a generator OnRequest that yields one request and then two in parallel, and returns a
+    response built from all three responses.
+    """
+    mybs = iris.ref()
+    status = iris.Ens.Director.CreateBusinessService("AllPyComponents.AdapterlessBS", mybs)
+    adapterless = mybs.value
+    adapterless.TargetConfigName = "AllPyComponents.StepsBP"
+    response = iris.ref()
+    status = adapterless.ProcessInput("testSteps", response)
+    response = response.value.name
+    adapterless.PythonClassObject = ""
+    expected = "steps: response from BOmethod1, response from BOmethod2, response from BOmethod5"
+    assert response == expected, f"response was {response}"
+
+def test_record_batch_text_default():
+    """
+    This method tests that a str record field of a RecordBatch cannot default to None, which its column
+    cannot store.
+    """
+    from intersystems_pyprod import RecordBatch
+
+    with pytest.raises(TypeError, match="note"):
+        class NoteBatch(RecordBatch):
+            amount: int
+            note: str = None
+
+def test_scatter_unsent():
+    """
+    This method tests that a request scatter could not send is None in the list passed to OnGather, and that
+    OnGather is called right away when none could be sent.
+    """
+    response = scatter_through_gather_bp("testGatherUnsent")
+    assert response == "gathered 2: response from BOmethod1,None", f"response was {response}"
+    response = scatter_through_gather_bp("testGatherNoneSent")
+    assert response == "gathered 1: None", f"response was {response}"
+
+def test_generator_steps_across_jobs(monkeypatch):
+    """
+    This method tests a generator OnRequest resumed in a second job of the pool and then in the first one
+    again. Each job has its own generators, and the business process instance is read again from its saved
+    PythonStepState for every callback, as %OpenId does in a job that does not hold it open.
+    """
+    from intersystems_pyprod import BusinessProcess, Status
+    from intersystems_pyprod import _production_connector
+
+    saved = {"PythonStepState": ""}
+    sent = []
+
+    class ProcessInstance:
+        def __init__(self):
+            self.PythonStepState = saved["PythonStepState"]
+
+        def SendRequestAsync(self, target, request, response_required, completion_key, description):
+            sent.append((target, request.StringValue, completion_key))
+            return 1
+
+    class JobStepsBP(BusinessProcess):
+        iris_package_name = "AllPyComponents"
+
+        def OnRequest(self, request):
+            first = yield ("First", iris.cls("Ens.StringRequest")._New())
+            second, third = yield [
+                ("Second", iris.cls("Ens.StringRequest")._New()),
+                ("Third", iris.cls("Ens.StringRequest")._New()),
+            ]
+            fourth = yield ("Fourth", iris.cls("Ens.StringRequest")._New())
+            return Status.OK(), ",".join(response.StringValue for response in (first, second, third, fourth))
+
+    jobs = {"first job": {}, "second job": {}}
+
+    def callback(job, helper):
+        monkeypatch.setattr(_production_connector, "_step_generators", jobs[job])
+        instance = ProcessInstance()
+        result = helper(JobStepsBP(instance))
+        saved["PythonStepState"] = instance.PythonStepState
+        for _, python_object, _ in jobs[job].values():
+            assert python_object.iris_host_object is None
+        return result
+
+    def respond(job):
+        calls = list(sent)
+        sent.clear()
+        result = None
+        for target, _, completion_key in calls:
+            response = iris.cls("Ens.StringResponse")._New()
+            response.StringValue = "response from " + target
+            response._Save()
+            result = callback(job, lambda bp: bp.OnResponseHelper(None, None, None, response, completion_key))
+        return result
+
+    request = iris.cls("Ens.StringRequest")._New()
+    callback("first job", lambda bp: bp.OnRequestHelper(request))
+    respond("second job")
+    respond("first job")
+    result = respond("first job")
+    assert result["status"] == 1, f"status was {result['status']}"
+    expected = "response from First,response from Second,response from Third,response from Fourth"
+    assert result["response"] == expected, f"response was {result['response']}"
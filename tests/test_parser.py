@@ -0,0 +1,43 @@
+import textwrap
+
+from intersystems_pyprod._parser import main
+
+INLINE_SUBCLASSES = '''
+from intersystems_pyprod import Column, JsonSerialize, PickleSerialize
+
+iris_package_name = "ParserInline"
+
+class JsonParent(JsonSerialize):
+    name = Column()
+
+class JsonInlineChild(JsonParent, inline_max=512):
+    amount = 0
+
+class PickleInlineParent(PickleSerialize, inline_max=100):
+    name = Column()
+
+class PickleInlineChild(PickleInlineParent, inline_max=200):
+    amount = 0
+'''
+
+def test_inline_max_on_subclass(tmp_path):
+    """
+    This method tests that a message subclass declaring inline_max gets the SerializedData property and the
+    methods reading it when its parent class does not have them, and not again when its parent does.
+    """
+    script = tmp_path / "parser_inline_messages.py"
+    script.write_text(textwrap.dedent(INLINE_SUBCLASSES))
+    output = tmp_path / "classes"
+    output.mkdir()
+    main([str(script), "-o", str(output), "--manual"])
+
+    json_child = (output / "JsonInlineChild.cls").read_text()
+    assert "Extends (ParserInline.JsonParent)" in json_child
+    assert 'Property SerializedData As %String (MAXLEN = "");' in json_child
+    assert "Method chunksFromIRIS(" in json_child
+    assert "SerializedData" not in (output / "JsonParent.cls").read_text()
+
+    pickle_child = (output / "PickleInlineChild.cls").read_text()
+    assert "Extends (ParserInline.PickleInlineParent)" in pickle_child
+    assert "SerializedData" not in pickle_child
+    assert 'Property SerializedData As %Binary (MAXLEN = "");' in (output / "PickleInlineParent.cls").read_text()